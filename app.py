@@ -1,8 +1,21 @@
 import streamlit as st
-import os
-from datetime import datetime
-import json
-from scraper_cnn import get_article_text_from_urls
+from dotenv import load_dotenv
+
+# Settings are read from the environment when the modules below are
+# imported, so .env has to be loaded first
+load_dotenv()
+
+from jobs import get_job, submit as submit_job  # noqa: E402
+from article_store import get_store  # noqa: E402
+
+# Seconds between status updates of a running comparison
+JOB_POLL_SECONDS = 0.5
+# Sources one comparison can take, and the labels of the first inputs
+MAX_SOURCES = 10
+SOURCE_INPUTS = {
+    1: ("CNN Article URL", "https://www.cnn.com/..."),
+    2: ("Fox News Article URL", "https://www.foxnews.com/..."),
+}
 
 # Page configuration
 st.set_page_config(
@@ -83,73 +96,118 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def save_article(analysis, urls):
-    """Save article analysis and metadata to JSON"""
+def save_article(analysis, urls, content=None, languages=None):
+    """Save article analysis and metadata to the article store"""
     try:
-        # Get absolute path and create directory if it doesn't exist
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        saved_file = os.path.join(current_dir, "saved_articles.json")
+        store = get_store()
         
         # Debug prints to streamlit sidebar for visibility
-        st.sidebar.write(f"Saving to: {saved_file}")
+        st.sidebar.write(f"Saving to: {store.path}")
         
-        article_data = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "analysis": analysis,
-            "url1": urls[0],
-            "url2": urls[1]
-        }
+        # Keep the unified file as reference and the article body in the store
+        file = None
+        if analysis.startswith("Analysis saved to"):
+            file = analysis.split("Analysis saved to ")[-1].strip()
+            if content is None:
+                with open(file, 'r', encoding='utf-8') as f:
+                    content = f.read()
         
-        # Initialize or load saved_articles
-        try:
-            if os.path.exists(saved_file):
-                with open(saved_file, 'r', encoding='utf-8') as f:
-                    saved_articles = json.load(f)
-                    if not isinstance(saved_articles, list):
-                        saved_articles = []
-            else:
-                saved_articles = []
-        except Exception:
-            saved_articles = []
-        
-        # Append new article
-        saved_articles.append(article_data)
-        
-        # Save with explicit encoding
-        with open(saved_file, 'w', encoding='utf-8') as f:
-            json.dump(saved_articles, f, indent=4, ensure_ascii=False)
-            
-        # Verify save was successful
-        if os.path.exists(saved_file):
-            st.sidebar.success(f"Saved successfully! Total articles: {len(saved_articles)}")
-            return True
-            
-        return False
+        store.add_analysis(content or analysis, urls, file=file, languages=languages)
+        st.sidebar.success(f"Saved successfully! Total articles: {store.count()}")
+        return True
             
     except Exception as e:
         st.sidebar.error(f"Error saving: {str(e)}")
         return False
 
+def show_run_metrics():
+    """Sidebar breakdown of where the time of the last comparison went"""
+    summary = st.session_state.get('last_run_metrics')
+    if not summary:
+        return
+    with st.sidebar.expander("Last run metrics"):
+        st.caption(f"Total {summary['elapsed']:.2f} s")
+        st.table([{"stage": stage, "seconds": round(seconds, 3)} for stage, seconds in summary["stages"].items()])
+        st.table([{"counter": name.replace("_", " "), "value": value} for name, value in summary["counters"].items()])
+
+def load_job_result(job):
+    """Copy a finished job into the session once; returns whether it was new"""
+    if st.session_state.get('loaded_job') == job.id:
+        return False
+    st.session_state.loaded_job = job.id
+    st.session_state.last_run_metrics = job.stream.metrics.summary()
+    if job.status == "done":
+        st.session_state.analysis = f"Analysis saved to {job.stream.unified_file}"
+        st.session_state.analysis_content = job.content
+        st.session_state.source_languages = job.stream.source_languages
+        st.session_state.analysis_urls = job.urls
+        st.session_state.saved = False
+    return True
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress(job_id):
+    """Poll a running job, showing the article as it is written"""
+    job = get_job(job_id)
+    if job is None or job.done:
+        # Rerun the whole page to show the finished analysis
+        st.rerun()
+    st.info(job.progress())
+    if job.content:
+        st.markdown(job.content)
+
+def show_job(job_id):
+    """Status or outcome of the comparison job of this session"""
+    job = get_job(job_id)
+    if job is None:
+        if st.session_state.get('loaded_job') != job_id:
+            st.warning("This analysis is no longer available. Please run the comparison again.")
+        st.session_state.job_id = None
+        st.query_params.pop("job", None)
+        return
+    if not job.done:
+        show_job_progress(job_id)
+        return
+    # The session stops following the job once it has the result
+    st.session_state.job_id = None
+    st.query_params.pop("job", None)
+    if load_job_result(job):
+        if job.status == "error":
+            st.error(job.error)
+        else:
+            st.success("Analysis completed successfully!")
+
 def main():
     st.markdown("<h1 class='title'>News Article Comparison Analysis</h1>", unsafe_allow_html=True)
 
-    # Create a container for URL inputs
+    if 'url_count' not in st.session_state:
+        st.session_state.url_count = 2
+
+    # Create a container for URL inputs, two per row
     with st.container():
         st.markdown("<div class='url-input'>", unsafe_allow_html=True)
         
-        col1, col2 = st.columns(2)
-        
+        urls = []
+        for row in range(0, st.session_state.url_count, 2):
+            for number, col in enumerate(st.columns(2), row + 1):
+                if number > st.session_state.url_count:
+                    break
+                with col:
+                    label, placeholder = SOURCE_INPUTS.get(number, (f"Source {number} URL", "https://..."))
+                    st.markdown(f"<p class='label'>{label}</p>", unsafe_allow_html=True)
+                    urls.append(st.text_input(label,
+                        key=f"url_{number}",
+                        placeholder=placeholder,
+                        label_visibility="collapsed"))
+
+        col1, col2, col3 = st.columns([1, 1, 2])
         with col1:
-            st.markdown("<p class='label'>CNN Article URL</p>", unsafe_allow_html=True)
-            url1 = st.text_input("", 
-                placeholder="https://www.cnn.com/...",
-                label_visibility="collapsed")
-        
+            if st.button("➕ Add source", disabled=st.session_state.url_count >= MAX_SOURCES, use_container_width=True):
+                st.session_state.url_count += 1
+                st.rerun()
         with col2:
-            st.markdown("<p class='label'>Fox News Article URL</p>", unsafe_allow_html=True)
-            url2 = st.text_input("", 
-                placeholder="https://www.foxnews.com/...",
-                label_visibility="collapsed")
+            if st.button("➖ Remove source", disabled=st.session_state.url_count <= 2, use_container_width=True):
+                st.session_state.url_count -= 1
+                st.rerun()
         
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -161,38 +219,43 @@ def main():
     # Initialize session states
     if 'analysis' not in st.session_state:
         st.session_state.analysis = None
+    if 'analysis_content' not in st.session_state:
+        st.session_state.analysis_content = None
     if 'saved' not in st.session_state:
         st.session_state.saved = False
 
     if compare_button:
-        if url1 and url2:
-            # Reset saved state for new analysis
-            st.session_state.saved = False
-            
-            with st.spinner('Analyzing articles... This might take a minute.'):
-                try:
-                    result = get_article_text_from_urls(url1, url2)
-                    if result.startswith("Error"):
-                        st.error(result)
-                    else:
-                        # Store analysis directly in session state
-                        st.session_state.analysis = result
-                        st.success("Analysis completed successfully!")
-                except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
+        urls = [url.strip() for url in urls if url.strip()]
+        if len(urls) >= 2:
+            # Runs in the background; an identical comparison already running is joined
+            job = submit_job(urls)
+            st.session_state.analysis = None
+            st.session_state.job_id = job.id
+            st.query_params["job"] = job.id
         else:
-            st.warning("Please enter both URLs to proceed with the analysis.")
+            st.warning("Please enter at least two URLs to proceed with the analysis.")
+
+    # The job ID is also kept in the URL, so a page refresh picks the job up again
+    job_id = st.session_state.get('job_id') or st.query_params.get("job")
+    if job_id:
+        st.session_state.job_id = job_id
+        show_job(job_id)
+
+    show_run_metrics()
     
     # Show the analysis and save button in a single place
     if st.session_state.analysis and not st.session_state.saved:
         with st.expander("View Analysis", expanded=True):
-            st.markdown(st.session_state.analysis)
+            st.markdown(st.session_state.analysis_content or st.session_state.analysis)
             
             # Only show save button if not saved
             col1, col2, col3 = st.columns([1,2,1])
             with col2:
                 if st.button("💾 Save Analysis", key="save_button", use_container_width=True):
-                    if save_article(st.session_state.analysis, [url1, url2]):
+                    if save_article(st.session_state.analysis,
+                                    st.session_state.get('analysis_urls') or urls,
+                                    st.session_state.analysis_content,
+                                    st.session_state.get('source_languages')):
                         st.success("Analysis saved! View it in the Saved Articles page.")
                         st.session_state.saved = True
                         st.rerun()
@@ -0,0 +1,480 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from related_index import RelatedIndex, term_vector
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_PATH = os.getenv("ARTICLE_STORE_PATH", os.path.join(BASE_DIR, "saved_articles.sqlite"))
+
+# Legacy storage imported once into the store
+LEGACY_JSON = os.path.join(BASE_DIR, "saved_articles.json")
+ARTICLES_DIR = os.path.join(BASE_DIR, "articles")
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    file TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_timestamp ON analyses(timestamp);
+CREATE TABLE IF NOT EXISTS sources (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (analysis_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_sources_url ON sources(url);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Listing metadata precomputed at save time (schema version 1)
+LISTING_COLUMNS = ("headline", "word_count", "domains", "languages")
+LISTING_FIELDS = ", ".join(("id", "timestamp", "file") + LISTING_COLUMNS)
+LISTING_FIELDS_A = ", ".join(f"a.{field}" for field in ("id", "timestamp", "file") + LISTING_COLUMNS)
+
+# Placeholders per IN (...) query, below SQLite's variable limit
+_IN_BATCH = 500
+
+_FILE_TIMESTAMP = re.compile(r"unified_(\d{8}_\d{6})\.txt$")
+
+
+class ArticleStore:
+    """Saved analyses in SQLite (WAL mode), safe for concurrent sessions"""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._related = None
+        self._related_lock = threading.Lock()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._upgrade_schema(conn)
+        self._migrate_legacy(conn)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _upgrade_schema(self, conn):
+        """Bring stores created by older versions up to the current schema"""
+        self.has_fts = _fts5_available(conn)
+        migrations = [self._add_listing_columns, self._create_search_index, self._create_vector_index]
+        for version, migrate in enumerate(migrations, 1):
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated while we waited for the lock
+                if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                    migrate(conn)
+                    conn.execute(f"PRAGMA user_version = {version}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                self._related = None
+                raise
+
+    def _add_listing_columns(self, conn):
+        """Add and backfill the precomputed listing columns"""
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(analyses)")}
+        for column, kind in zip(LISTING_COLUMNS, ("TEXT", "INTEGER", "TEXT", "TEXT")):
+            if column not in existing:
+                conn.execute(f"ALTER TABLE analyses ADD COLUMN {column} {kind}")
+        for row in conn.execute("SELECT id, body FROM analyses").fetchall():
+            urls = [r["url"] for r in conn.execute(
+                "SELECT url FROM sources WHERE analysis_id = ? ORDER BY position", (row["id"],))]
+            listing = listing_metadata(row["body"], urls)
+            conn.execute(
+                "UPDATE analyses SET headline = ?, word_count = ?, domains = ?, languages = ? WHERE id = ?",
+                (*(listing[c] for c in LISTING_COLUMNS), row["id"]),
+            )
+
+    def _create_search_index(self, conn):
+        """Create the full-text index and back-fill it from every saved analysis in bulk"""
+        if not self.has_fts:
+            return
+        conn.execute(
+            """CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5(
+                   headline, body, content='analyses', content_rowid='id', tokenize='porter unicode61'
+               )"""
+        )
+        conn.execute("INSERT INTO analyses_fts(analyses_fts) VALUES ('rebuild')")
+
+    def _create_vector_index(self, conn):
+        """Create the term-vector table and index every saved analysis, oldest first"""
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS analysis_vectors (
+                   analysis_id INTEGER PRIMARY KEY REFERENCES analyses(id) ON DELETE CASCADE,
+                   columns BLOB NOT NULL,
+                   counts BLOB NOT NULL,
+                   cluster INTEGER NOT NULL
+               )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_vectors_cluster ON analysis_vectors(cluster)")
+        for row in conn.execute("SELECT id, body FROM analyses ORDER BY id").fetchall():
+            self._index_analysis(conn, row["id"], row["body"])
+
+    def _related_index(self, conn):
+        """The in-memory vector index, brought up to date with the table"""
+        with self._related_lock:
+            if self._related is None:
+                self._related = RelatedIndex()
+            index = self._related
+        index.refresh(conn)
+        return index
+
+    def _index_analysis(self, conn, analysis_id, body):
+        """Store the term vector of an analysis and join it to the clusters of similar ones.
+
+        An analysis similar enough to members of several clusters merges
+        them; a cluster is labelled with the ID of its oldest analysis.
+        """
+        columns, counts = term_vector(body)
+        neighbours = self._related_index(conn).neighbours(columns, counts)
+        clusters = {analysis_id}
+        for start in range(0, len(neighbours), _IN_BATCH):
+            batch = neighbours[start:start + _IN_BATCH]
+            clusters.update(row["cluster"] for row in conn.execute(
+                f"SELECT DISTINCT cluster FROM analysis_vectors WHERE analysis_id IN ({','.join('?' * len(batch))})",
+                batch,
+            ))
+        cluster = min(clusters)
+        for other in clusters - {cluster, analysis_id}:
+            conn.execute("UPDATE analysis_vectors SET cluster = ? WHERE cluster = ?", (cluster, other))
+        conn.execute(
+            "INSERT INTO analysis_vectors (analysis_id, columns, counts, cluster) VALUES (?, ?, ?, ?)",
+            (analysis_id, columns, counts, cluster),
+        )
+
+    def _insert(self, conn, body, urls, timestamp, file, languages=None):
+        listing = listing_metadata(body, urls, languages)
+        cursor = conn.execute(
+            """INSERT INTO analyses (timestamp, file, body, headline, word_count, domains, languages)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (timestamp, file, body, *(listing[c] for c in LISTING_COLUMNS)),
+        )
+        analysis_id = cursor.lastrowid
+        if self.has_fts:
+            conn.execute(
+                "INSERT INTO analyses_fts (rowid, headline, body) VALUES (?, ?, ?)",
+                (analysis_id, listing["headline"], body),
+            )
+        conn.executemany(
+            "INSERT INTO sources (analysis_id, position, url) VALUES (?, ?, ?)",
+            [(analysis_id, position, url) for position, url in enumerate(urls)],
+        )
+        self._index_analysis(conn, analysis_id, body)
+        # Bumped on every write so readers can cache listings per version
+        conn.execute(
+            """INSERT INTO meta (key, value) VALUES ('version', '1')
+               ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"""
+        )
+        return analysis_id
+
+    def add_analysis(self, body, urls, file=None, timestamp=None, languages=None):
+        """Append one analysis in a single transaction and return its ID"""
+        timestamp = timestamp or datetime.now().strftime(TIMESTAMP_FORMAT)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            analysis_id = self._insert(conn, body, urls, timestamp, file, languages)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            # The index may hold rows of the rolled-back transaction
+            self._related = None
+            raise
+        return analysis_id
+
+    def _attach_sources(self, conn, rows):
+        analyses = [dict(row) for row in rows]
+        if not analyses:
+            return analyses
+        by_id = {a["id"]: a for a in analyses}
+        for a in analyses:
+            a["urls"] = []
+        placeholders = ",".join("?" * len(by_id))
+        for source in conn.execute(
+            f"SELECT analysis_id, url FROM sources WHERE analysis_id IN ({placeholders}) ORDER BY position",
+            list(by_id),
+        ):
+            by_id[source["analysis_id"]]["urls"].append(source["url"])
+        return analyses
+
+    def list_analyses(self, limit=None, offset=0):
+        """Listing metadata of saved analyses (without body), newest first"""
+        conn = self._connect()
+        rows = conn.execute(
+            f"SELECT {LISTING_FIELDS} FROM analyses ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        ).fetchall()
+        return self._attach_sources(conn, rows)
+
+    def find_by_url(self, url):
+        """Saved analyses that used url as one of their sources, newest first"""
+        conn = self._connect()
+        rows = conn.execute(
+            f"""SELECT DISTINCT {LISTING_FIELDS_A} FROM analyses a
+               JOIN sources s ON s.analysis_id = a.id
+               WHERE s.url = ? ORDER BY a.timestamp DESC, a.id DESC""",
+            (url,),
+        ).fetchall()
+        return self._attach_sources(conn, rows)
+
+    def search(self, query, limit=20):
+        """Analyses matching query, best first, each with a highlighted snippet"""
+        terms = query.split()
+        if not terms:
+            return []
+        conn = self._connect()
+        if self.has_fts:
+            # Quote every term so user input is never parsed as FTS syntax; prefix-match the last
+            match = " ".join('"{}"'.format(t.replace('"', '""')) for t in terms) + "*"
+            rows = conn.execute(
+                f"""SELECT {LISTING_FIELDS_A},
+                       snippet(analyses_fts, 1, '**', '**', ' … ', 24) AS snippet
+                    FROM analyses_fts JOIN analyses a ON a.id = analyses_fts.rowid
+                    WHERE analyses_fts MATCH ?
+                    ORDER BY bm25(analyses_fts, 4.0, 1.0) LIMIT ?""",
+                (match, limit),
+            ).fetchall()
+        else:
+            where = " AND ".join("(a.headline LIKE ? OR a.body LIKE ?)" for _ in terms)
+            params = [p for t in terms for p in (f"%{t}%", f"%{t}%")]
+            rows = conn.execute(
+                f"""SELECT {LISTING_FIELDS_A}, NULL AS snippet FROM analyses a
+                    WHERE {where} ORDER BY a.timestamp DESC LIMIT ?""",
+                (*params, limit),
+            ).fetchall()
+        return self._attach_sources(conn, rows)
+
+    def list_clusters(self, limit=None, offset=0):
+        """Newest analysis of every story cluster, newest first.
+
+        Each carries its cluster label and cluster_size, the number of saved
+        analyses of the story.
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            f"""WITH ranked AS (
+                   SELECT analysis_id, cluster, COUNT(*) OVER (PARTITION BY cluster) AS cluster_size,
+                          ROW_NUMBER() OVER (PARTITION BY cluster ORDER BY a.timestamp DESC, a.id DESC) AS recency
+                   FROM analysis_vectors JOIN analyses a ON a.id = analysis_id
+               )
+               SELECT {LISTING_FIELDS_A}, r.cluster, r.cluster_size FROM ranked r
+               JOIN analyses a ON a.id = r.analysis_id
+               WHERE r.recency = 1 ORDER BY a.timestamp DESC, a.id DESC LIMIT ? OFFSET ?""",
+            (-1 if limit is None else limit, offset),
+        ).fetchall()
+        return self._attach_sources(conn, rows)
+
+    def count_clusters(self):
+        return self._connect().execute("SELECT COUNT(DISTINCT cluster) FROM analysis_vectors").fetchone()[0]
+
+    def cluster_members(self, cluster):
+        """Listing metadata of every analysis in a cluster, newest first"""
+        conn = self._connect()
+        rows = conn.execute(
+            f"""SELECT {LISTING_FIELDS_A}, v.cluster FROM analyses a
+               JOIN analysis_vectors v ON v.analysis_id = a.id
+               WHERE v.cluster = ? ORDER BY a.timestamp DESC, a.id DESC""",
+            (cluster,),
+        ).fetchall()
+        return self._attach_sources(conn, rows)
+
+    def related(self, analysis_id, k=None, other_stories=True):
+        """Listing metadata of the k analyses most similar to analysis_id, best first, with their score.
+
+        With other_stories, analyses in the same cluster are left out.
+        """
+        conn = self._connect()
+        exclude = []
+        if other_stories:
+            exclude = [row["analysis_id"] for row in conn.execute(
+                """SELECT analysis_id FROM analysis_vectors
+                   WHERE cluster = (SELECT cluster FROM analysis_vectors WHERE analysis_id = ?)""",
+                (analysis_id,),
+            )]
+        scores = dict(self._related_index(conn).related(analysis_id, k, exclude=exclude))
+        if not scores:
+            return []
+        rows = conn.execute(
+            f"""SELECT {LISTING_FIELDS_A}, v.cluster FROM analyses a
+               JOIN analysis_vectors v ON v.analysis_id = a.id
+               WHERE a.id IN ({",".join("?" * len(scores))})""",
+            list(scores),
+        ).fetchall()
+        analyses = self._attach_sources(conn, rows)
+        for analysis in analyses:
+            analysis["score"] = scores[analysis["id"]]
+        return sorted(analyses, key=lambda analysis: -analysis["score"])
+
+    def get_body(self, analysis_id):
+        row = self._connect().execute("SELECT body FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        return row["body"] if row else None
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def version(self):
+        """Counter that changes whenever an analysis is added"""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row["value"]) if row else 0
+
+    def _migrate_legacy(self, conn):
+        """One-time import of saved_articles.json and the articles/ directory"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_migrated'").fetchone():
+                conn.execute("ROLLBACK")
+                return
+
+            imported_files = set()
+            for entry in _read_legacy_json():
+                body, file = _resolve_legacy_analysis(entry.get("analysis"))
+                if body is None:
+                    continue
+                urls = [url for url in (entry.get("url1"), entry.get("url2")) if url]
+                self._insert(conn, body, urls, entry.get("timestamp") or "", file)
+                if file:
+                    imported_files.add(file)
+
+            # Unified files that were never saved through the app
+            if os.path.isdir(ARTICLES_DIR):
+                for name in sorted(os.listdir(ARTICLES_DIR)):
+                    match = _FILE_TIMESTAMP.search(name)
+                    file = f"articles/{name}"
+                    if not match or file in imported_files:
+                        continue
+                    body = _read_file(os.path.join(ARTICLES_DIR, name))
+                    if body is None:
+                        continue
+                    timestamp = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").strftime(TIMESTAMP_FORMAT)
+                    self._insert(conn, body, [], timestamp, file)
+
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_migrated', ?)",
+                         (datetime.now().strftime(TIMESTAMP_FORMAT),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            self._related = None
+            raise
+
+
+def extract_headline_and_content(content):
+    """Extract headline and clean content from the analysis"""
+    if not content:
+        return None, None
+    
+    # Split content into lines while preserving empty lines
+    lines = content.splitlines(keepends=True)
+    headline = None
+    content_lines = []
+    content_started = False
+    
+    for line in lines:
+        # Check for headline
+        if not headline and line.lower().strip().startswith('headline:'):
+            headline = line.replace('Headline:', '').strip()
+            content_started = True
+            continue
+        
+        # After finding headline, collect remaining content including empty lines
+        if content_started:
+            content_lines.append(line)
+        # If no explicit headline found, use first non-empty line as headline
+        elif not headline and line.strip() and len(line.strip()) < 150:
+            headline = line.strip()
+            content_started = True
+            continue
+    
+    # Join content lines preserving all original line breaks
+    cleaned_content = ''.join(content_lines)
+    
+    return headline, cleaned_content
+
+def listing_metadata(body, urls, languages=None):
+    """Headline, word count, source domains and languages shown in listings"""
+    headline, _ = extract_headline_and_content(body)
+    domains = []
+    for url in urls:
+        domain = (urlsplit(url).hostname or "").lower()
+        domain = domain[4:] if domain.startswith("www.") else domain
+        if domain and domain not in domains:
+            domains.append(domain)
+    return {
+        "headline": headline,
+        "word_count": len(body.split()),
+        "domains": ",".join(domains),
+        "languages": ",".join(lang for lang in languages if lang) if languages else None,
+    }
+
+
+def _fts5_available(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _read_file(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _read_legacy_json():
+    if not os.path.exists(LEGACY_JSON):
+        return []
+    try:
+        with open(LEGACY_JSON, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+    return entries if isinstance(entries, list) else []
+
+
+def _resolve_legacy_analysis(analysis):
+    """Return (body, file) for a legacy entry that holds text or a file pointer"""
+    if not isinstance(analysis, str):
+        return None, None
+    if analysis.startswith("Analysis saved to"):
+        file = analysis.split("Analysis saved to ")[-1].strip()
+        return _read_file(os.path.join(BASE_DIR, file)), file
+    return analysis, None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide article store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArticleStore()
+    return _store
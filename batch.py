@@ -0,0 +1,148 @@
+"""Run many article comparisons unattended.
+
+Reads URL pairs from a JSONL file, one object per line with "url1" and
+"url2" (or a "urls" list), and writes one JSON result per line. Finished
+pairs are recorded in a checkpoint file so an interrupted run can simply
+be started again and only processes what is left.
+
+    python batch.py pairs.jsonl --output results.jsonl --concurrency 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+# Settings are read from the environment when the modules below are
+# imported, so .env has to be loaded first
+load_dotenv()
+
+import fetcher  # noqa: E402
+from fetcher import pair_id  # noqa: E402
+from scraper_cnn import stream_article_from_urls  # noqa: E402
+
+
+def read_pairs(path):
+    """Yield (id, urls) for every usable line of the input file"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping line {line_no}: not valid JSON", file=sys.stderr)
+                continue
+            urls = record.get("urls") or [record.get("url1"), record.get("url2")]
+            urls = [url for url in urls if url]
+            if len(urls) < 2:
+                print(f"Skipping line {line_no}: needs two URLs", file=sys.stderr)
+                continue
+            yield record.get("id") or pair_id(urls), urls
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def compare_with_retries(urls, retries, backoff):
+    """Run one comparison, retrying transient failures with jittered exponential backoff.
+
+    Pages that are missing (4xx other than 408/429), too large or hold no
+    article fail the same way every time and are not retried.
+    """
+    started = time.monotonic()
+    for attempt in range(1, retries + 2):
+        stream = stream_article_from_urls(*urls)
+        for _ in stream:
+            pass
+        if not stream.error:
+            return {
+                "status": "ok",
+                "unified_file": stream.unified_file,
+                "content": stream.content,
+                "source_languages": stream.source_languages,
+                "attempts": attempt,
+                "elapsed": round(time.monotonic() - started, 3),
+            }
+        if stream.permanent_error or attempt > retries:
+            break
+        time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    return {
+        "status": "error",
+        "error": stream.error,
+        "permanent": stream.permanent_error,
+        "attempts": attempt,
+        "elapsed": round(time.monotonic() - started, 3),
+    }
+
+
+def run_batch(input_path, output_path, checkpoint_path=None, concurrency=4,
+              retries=3, backoff=2.0, per_domain=2, domain_interval=1.0):
+    """Process every pending pair of input_path and append results to output_path"""
+    checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    pending = [(pid, urls) for pid, urls in read_pairs(input_path) if pid not in done]
+    print(f"{len(done)} pairs already done, {len(pending)} to go", file=sys.stderr)
+
+    fetcher.configure_politeness(per_domain, domain_interval)
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "error": 0}
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(compare_with_retries, urls, retries, backoff): (pid, urls) for pid, urls in pending}
+        for future in as_completed(futures):
+            pid, urls = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"status": "error", "error": f"Error in comparison: {str(e)}", "attempts": 0}
+            record = {"id": pid, "urls": urls, **result}
+
+            # Result first, then checkpoint, so a crash never loses a finished pair.
+            # Pairs that can never succeed are checkpointed as well
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                if result["status"] == "ok" or result.get("permanent"):
+                    checkpoint.write(pid + "\n")
+                    checkpoint.flush()
+            counts[result["status"]] += 1
+            print(f"[{counts['ok'] + counts['error']}/{len(pending)}] {result['status']} {pid}", file=sys.stderr)
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare many article pairs from a JSONL file")
+    parser.add_argument("input", help="JSONL file with url1/url2 (or urls) per line")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--checkpoint", help="file of finished pair IDs (default: <output>.checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=4, help="comparisons running at once")
+    parser.add_argument("--retries", type=int, default=3, help="retries per pair on transient errors")
+    parser.add_argument("--backoff", type=float, default=2.0, help="base backoff in seconds")
+    parser.add_argument("--per-domain", type=int, default=2, help="concurrent requests per domain")
+    parser.add_argument("--domain-interval", type=float, default=1.0,
+                        help="minimum seconds between requests to one domain")
+    args = parser.parse_args(argv)
+
+    counts = run_batch(args.input, args.output, args.checkpoint, args.concurrency,
+                       args.retries, args.backoff, args.per_domain, args.domain_interval)
+    print(f"Done: {counts['ok']} ok, {counts['error']} failed", file=sys.stderr)
+    return 0 if counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Speed and accuracy of pairing same-story articles across outlets.
+
+First reads the fixture feeds (fixtures/feeds) through the fixture proxy to
+check the discovery path end to end, then pairs synthetic corpora of two
+outlets, where some stories are covered by both, and compares the batched
+sparse TF-IDF pairing with a pure-Python all-pairs cosine loop.
+
+    python benchmarks/bench_discovery.py --sizes 500,2000,8000 --naive-max 1000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import fixture_server  # noqa: E402
+
+FEEDS_DIR = os.path.join(BENCH_DIR, "fixtures", "feeds")
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ber", "dan", "gor", "hel", "kin", "mar", "pol", "str"]
+
+
+def make_vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_corpus(stories, rng, overlap=0.2, shared=0.6, words=180):
+    """Candidates of two outlets; a share of the stories is covered by both.
+
+    Returns (candidates, true pairs as sets of URLs).
+    """
+    vocabulary = make_vocabulary(20000, rng)
+    # Zipf-like background language, plus a small set of topic words per story
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    candidates, truth = [], set()
+    for story in range(stories):
+        topic = rng.sample(vocabulary, 25)
+        outlets = ["a.example", "b.example"] if rng.random() < shared else [rng.choice(["a.example", "b.example"])]
+        urls = []
+        for outlet in outlets:
+            text = [rng.choice(topic) if rng.random() < overlap else word
+                    for word in rng.choices(vocabulary, weights, k=words)]
+            url = f"https://www.{outlet}/story/{story}"
+            urls.append(url)
+            candidates.append({"url": url, "title": None, "published": None, "outlet": outlet,
+                               "text": " ".join(text)})
+        if len(urls) == 2:
+            truth.add(frozenset(urls))
+    rng.shuffle(candidates)
+    return candidates, truth
+
+
+def naive_pairs(candidates, threshold):
+    """All-pairs cosine of dict vectors across the two outlets, for comparison"""
+    from text_vectors import terms
+
+    counts = [Counter(terms(c["text"])) for c in candidates]
+    frequency = Counter(term for count in counts for term in count)
+    vectors = []
+    for count in counts:
+        vector = {term: (1 + math.log(n)) * (math.log((1 + len(counts)) / (1 + frequency[term])) + 1)
+                  for term, n in count.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1
+        vectors.append({term: v / norm for term, v in vector.items()})
+    found = []
+    for i, a in enumerate(candidates):
+        for j in range(i + 1, len(candidates)):
+            if candidates[j]["outlet"] == a["outlet"]:
+                continue
+            small, large = sorted((vectors[i], vectors[j]), key=len)
+            if sum(v * large.get(term, 0.0) for term, v in small.items()) >= threshold:
+                found.append((i, j))
+    return found
+
+
+def accuracy(pairs, truth):
+    found = {frozenset(pair["urls"]) for pair in pairs}
+    precision = len(found & truth) / len(found) if found else 1.0
+    recall = len(found & truth) / len(truth) if truth else 1.0
+    return precision, recall
+
+
+def check_feeds():
+    """Read the fixture feeds through the fixture proxy and pair what they link"""
+    server = fixture_server.start_server()
+    proxy = f"http://127.0.0.1:{server.server_port}"
+    os.environ.update({"CACHE_DIR": tempfile.mkdtemp(prefix="bench_discovery_"), "PAGE_CACHE": "0",
+                       "HTTP_PROXY": proxy, "http_proxy": proxy,
+                       "NO_PROXY": "127.0.0.1,localhost", "no_proxy": "127.0.0.1,localhost"})
+    from discovery import collect_candidates, pair_stories
+
+    feeds = sorted(os.path.join(FEEDS_DIR, name) for name in os.listdir(FEEDS_DIR))
+    started = time.perf_counter()
+    candidates = collect_candidates(feeds)
+    pairs = pair_stories(candidates, window_hours=0)
+    print(f"fixture feeds: {len(feeds)} feeds, {len(candidates)} articles extracted, {len(pairs)} pairs "
+          f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+    for candidate in candidates:
+        print(f"  {candidate['outlet']:<14} {len(candidate['text']):6d} chars  {candidate['url']}")
+    server.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="500,2000,8000", help="stories per synthetic corpus")
+    parser.add_argument("--naive-max", type=int, default=1000, help="largest corpus the all-pairs loop runs on")
+    parser.add_argument("--threshold", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    check_feeds()
+    from discovery import pair_stories
+
+    print(f"\n{'stories':>8} {'articles':>9} {'vectorized':>12} {'all-pairs':>12} {'precision':>10} {'recall':>8}")
+    for stories in [int(size) for size in args.sizes.split(",")]:
+        candidates, truth = make_corpus(stories, random.Random(args.seed))
+        started = time.perf_counter()
+        pairs = pair_stories(candidates, args.threshold, window_hours=0)
+        vectorized = time.perf_counter() - started
+        naive = "-"
+        if len(candidates) <= args.naive_max:
+            started = time.perf_counter()
+            naive_pairs(candidates, args.threshold)
+            naive = f"{time.perf_counter() - started:.2f} s"
+        precision, recall = accuracy(pairs, truth)
+        print(f"{stories:>8} {len(candidates):>9} {vectorized:>10.2f} s {naive:>12} {precision:>10.3f} {recall:>8.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Check every extractor against its recorded fixture and time it.
+
+Compares the registry (strained parse + precompiled selectors) with the
+old full html.parser scan of the whole page.
+
+    python benchmarks/bench_extractors.py [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from extractors import PARSER, extract_paragraphs, get_extractor  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_extract(html):
+    """Extraction as it was done before the registry: full tree, CNN blocks, then <article> <p>"""
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = soup.find_all("div", {"data-component": "text-block"})
+    if not paragraphs:
+        article_tag = soup.find("article")
+        if article_tag:
+            paragraphs = article_tag.find_all("p")
+    return [p.get_text() for p in paragraphs]
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="timing runs per fixture (best is reported)")
+    args = parser.parse_args(argv)
+
+    with open(os.path.join(FIXTURES_DIR, "expected.json"), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+
+    print(f"parser: {PARSER}")
+    print(f"{'fixture':<16} {'extractor':<10} {'paras':>5} {'ok':>3} {'registry ms':>12} {'legacy ms':>10}")
+    failures = 0
+    for name, spec in expected.items():
+        with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+            html = f.read()
+
+        extractor = get_extractor(spec["url"])
+        paragraphs = [" ".join(p.split()) for p in extract_paragraphs(html, spec["url"])]
+        ok = (
+            (extractor.name if extractor else None) == spec["extractor"]
+            and len(paragraphs) == spec["paragraphs"]
+            and paragraphs[0].startswith(spec["first"])
+        )
+        failures += not ok
+
+        registry_time = best_time(lambda: extract_paragraphs(html, spec["url"]), args.repeat)
+        legacy_time = best_time(lambda: legacy_extract(html), args.repeat)
+        print(f"{name:<16} {extractor.name if extractor else 'generic':<10} {len(paragraphs):>5} "
+              f"{'yes' if ok else 'NO':>3} {registry_time * 1000:>12.2f} {legacy_time * 1000:>10.2f}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
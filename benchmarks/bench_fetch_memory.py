@@ -0,0 +1,74 @@
+"""Peak memory and time of downloading and extracting large pages.
+
+Serves the fixtures padded with a large inline JSON blob after the article
+and scrapes each of them in a fresh interpreter, once reading the page
+whole and once streaming it through the incremental parser, reporting the
+peak traced allocation (tracemalloc) of each. Pages without a streaming
+rule that are larger than --max-mb are refused from their Content-Length
+in streaming mode; use a smaller --padding-mb to compare them too.
+
+    python benchmarks/bench_fetch_memory.py [--padding-mb 20] [--max-mb 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fixture_server  # noqa: E402
+
+# Run in a child process so each mode starts from a clean heap
+CHILD = """
+import json, sys, time, tracemalloc
+tracemalloc.start()
+import scraper_cnn
+tracemalloc.reset_peak()
+baseline = tracemalloc.get_traced_memory()[0]
+started = time.perf_counter()
+try:
+    text = scraper_cnn.scrape_article(sys.argv[1])
+    error = None
+except Exception as e:
+    text, error = None, f"{type(e).__name__}: {e}"
+elapsed = time.perf_counter() - started
+peak = tracemalloc.get_traced_memory()[1] - baseline
+print(json.dumps({"peak": peak, "elapsed": elapsed, "chars": len(text or ""), "error": error}))
+"""
+
+
+def scrape(url, streaming, env):
+    env = dict(env, FETCH_STREAMING="1" if streaming else "0")
+    result = subprocess.run([sys.executable, "-c", CHILD, url], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--padding-mb", type=float, default=20.0, help="inline JSON added to every page")
+    parser.add_argument("--max-mb", type=float, default=5.0, help="FETCH_MAX_MB for the runs")
+    args = parser.parse_args(argv)
+
+    server = fixture_server.start_server(padding_bytes=int(args.padding_mb * 1024 * 1024))
+    proxy = f"http://127.0.0.1:{server.server_port}"
+    env = dict(os.environ, CACHE_DIR=tempfile.mkdtemp(prefix="bench_fetch_"), PAGE_CACHE="0",
+               FETCH_MAX_MB=str(args.max_mb), HTTP_PROXY=proxy, http_proxy=proxy,
+               NO_PROXY="127.0.0.1,localhost", no_proxy="127.0.0.1,localhost")
+
+    print(f"pages padded by {args.padding_mb:g} MB, limit {args.max_mb:g} MB")
+    for name, url in fixture_server.fixture_urls().items():
+        for streaming in (False, True):
+            r = scrape(url, streaming, env)
+            outcome = r["error"] or f"{r['chars']} chars"
+            print(f"{name:<16} {'streaming' if streaming else 'whole':<10} "
+                  f"peak {r['peak'] / 1024 / 1024:7.1f} MB  {r['elapsed'] * 1000:7.1f} ms  {outcome}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
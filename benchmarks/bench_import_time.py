@@ -0,0 +1,58 @@
+"""Measure import cost of the app modules and enforce a budget.
+
+Runs `python -X importtime` in a fresh interpreter for each module, reports
+the cumulative import time and fails (exit code 1) when a module exceeds
+the budget or pulls in one of the heavy dependencies that must only be
+loaded on first use.
+
+    python benchmarks/bench_import_time.py [--budget-ms 150]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported when the app or a page script starts
+MODULES = ["scraper_cnn", "article_store", "llm"]
+# Dependencies that must stay out of the import path
+HEAVY = ["openai", "bs4", "langdetect", "requests", "lxml", "tiktoken", "dotenv", "numpy", "scipy"]
+
+
+def import_profile(module):
+    """Return {imported module: cumulative microseconds} for importing module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="maximum cumulative import time per module")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for module in MODULES:
+        profile = import_profile(module)
+        elapsed_ms = profile.get(module, 0) / 1000
+        heavy = sorted({name.split(".")[0] for name in profile} & set(HEAVY))
+        ok = elapsed_ms <= args.budget_ms and not heavy
+        failures += not ok
+        note = f" (imports {', '.join(heavy)})" if heavy else ""
+        print(f"{module:<14} {elapsed_ms:8.1f} ms  {'ok' if ok else 'OVER BUDGET'}{note}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
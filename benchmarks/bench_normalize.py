@@ -0,0 +1,71 @@
+"""Micro-benchmark of paragraph normalization on the saved articles.
+
+Compares text_normalize (chained str.replace calls for the typographic
+characters, skipped for ASCII text, a precompiled punctuation pattern and
+one pass per document) with the per-paragraph cleanup loop it replaced.
+
+    python benchmarks/bench_normalize.py [--repeat 200]
+"""
+import argparse
+import glob
+import os
+import re
+import string
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from text_normalize import normalize_paragraphs  # noqa: E402
+
+
+def legacy_clean(paragraphs):
+    """The cleanup loop previously inlined in get_article_text_from_urls"""
+    article_text = "\n".join(paragraphs)
+    article_text = article_text.replace('"', '"').replace('"', '"')
+    article_text = article_text.replace('–', '-').replace('—', '-')
+    cleaned_paragraphs = []
+    for paragraph in article_text.split('\n'):
+        if paragraph.strip():
+            spaced = re.sub(r"([{}])".format(re.escape(string.punctuation)), r" \1 ", paragraph)
+            cleaned = re.sub(r'\s+', ' ', spaced).strip()
+            if cleaned:
+                cleaned_paragraphs.append(cleaned)
+    return cleaned_paragraphs
+
+
+def per_document_us(fn, documents, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for paragraphs in documents:
+            fn(paragraphs)
+        best = min(best, time.perf_counter() - start)
+    return best / len(documents) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="timing runs (best is reported)")
+    args = parser.parse_args(argv)
+
+    documents = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "articles", "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            documents.append(f.read().split("\n"))
+    if not documents:
+        print("No saved articles found in articles/")
+        return 1
+
+    paragraphs = sum(len(d) for d in documents)
+    print(f"{len(documents)} documents, {paragraphs} lines")
+    print(f"legacy loop:                {per_document_us(legacy_clean, documents, args.repeat):8.1f} us/doc")
+    print(f"normalize, punctuation kept: {per_document_us(normalize_paragraphs, documents, args.repeat):7.1f} us/doc")
+    spaced = lambda p: normalize_paragraphs(p, space_punctuation=True)  # noqa: E731
+    print(f"normalize, punctuation spaced: {per_document_us(spaced, documents, args.repeat):5.1f} us/doc")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
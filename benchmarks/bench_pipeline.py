@@ -0,0 +1,173 @@
+"""Offline end-to-end benchmark of the comparison pipeline.
+
+Serves the recorded fixtures from a local proxy, points the OpenAI client at
+a local fake chat-completions server and runs whole comparisons (fetch,
+parse, clean, detect, translate, synthesize, save) at several concurrency
+levels. Reports per-stage p50/p95 and throughput and writes them as JSON so
+runs on different commits can be compared.
+
+    python benchmarks/bench_pipeline.py --concurrency 1,2,4,8 --runs 8 --output bench.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_llm_server  # noqa: E402
+import fixture_server  # noqa: E402
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile of values, q in [0, 100]"""
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * q / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def isolate(workdir, fixture_port, llm_port):
+    """Route the pipeline to the local servers and keep its files out of the project"""
+    os.environ.update({
+        "CACHE_DIR": os.path.join(workdir, "cache"),
+        "PAGE_CACHE": "0",
+        "LLM_CACHE": "0",
+        "ARTICLE_STORE_PATH": os.path.join(workdir, "saved_articles.sqlite"),
+        "OPENAI_API_KEY": "bench",
+        # The fake server enforces its own limit (--rpm) and reports it in headers
+        "LLM_RPM": "1000000",
+        "LLM_TPM": "1000000000",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "HTTP_PROXY": f"http://127.0.0.1:{fixture_port}",
+        "http_proxy": f"http://127.0.0.1:{fixture_port}",
+        "NO_PROXY": "127.0.0.1,localhost",
+        "no_proxy": "127.0.0.1,localhost",
+    })
+    os.chdir(workdir)
+
+
+def run_comparison(*urls):
+    """One comparison saved to the store, returning its metrics summary and total seconds"""
+    import metrics
+    from article_store import get_store
+    from scraper_cnn import stream_article_from_urls
+
+    started = time.perf_counter()
+    stream = stream_article_from_urls(*urls)
+    for _ in stream:
+        pass
+    if stream.error:
+        raise RuntimeError(stream.error)
+    with metrics.collect(stream.metrics), metrics.span("save"):
+        get_store().add_analysis(stream.content, stream.urls, file=stream.unified_file,
+                                 languages=stream.source_languages)
+    return stream.metrics.summary(), time.perf_counter() - started
+
+
+def run_level(concurrency, runs, urls):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(lambda _: run_comparison(*urls), range(runs)))
+        elapsed = time.perf_counter() - started
+
+    import metrics
+
+    stages = {}
+    for stage in metrics.STAGES:
+        samples = [summary["stages"][stage] for summary, _ in results if stage in summary["stages"]]
+        if samples:
+            stages[stage] = {"p50": percentile(samples, 50), "p95": percentile(samples, 95),
+                             "mean": statistics.fmean(samples), "samples": len(samples)}
+    totals = [total for _, total in results]
+    counters = {counter: statistics.fmean(summary["counters"][counter] for summary, _ in results)
+                for counter in metrics.COUNTERS}
+    return {
+        "concurrency": concurrency,
+        "runs": runs,
+        "elapsed": elapsed,
+        "throughput_per_min": runs / elapsed * 60,
+        "total": {"p50": percentile(totals, 50), "p95": percentile(totals, 95)},
+        "stages": stages,
+        "counters_per_run": counters,
+    }
+
+
+def print_level(level):
+    print(f"\nconcurrency {level['concurrency']}: {level['runs']} runs in {level['elapsed']:.2f}s, "
+          f"{level['throughput_per_min']:.1f} comparisons/min, "
+          f"total p50 {level['total']['p50']:.3f}s p95 {level['total']['p95']:.3f}s")
+    for stage, t in level["stages"].items():
+        print(f"  {stage:<11} p50 {t['p50'] * 1000:9.1f} ms   p95 {t['p95'] * 1000:9.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--runs", type=int, default=8, help="comparisons per concurrency level")
+    parser.add_argument("--fetch-latency", type=float, default=0.05, help="seconds per fixture response")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--completion-tokens", type=int, default=600, help="length of synthesized articles")
+    parser.add_argument("--rpm", type=int, help="simulated requests-per-minute limit of the fake LLM server")
+    parser.add_argument("--translate", action="store_true", help="compare against the German fixture")
+    parser.add_argument("--sources", type=int, default=2, help="sources per comparison")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    fixtures = fixture_server.start_server(latency=args.fetch_latency)
+    llm = fake_llm_server.start_server(latency=args.llm_latency, tokens_per_second=args.tokens_per_second,
+                                       completion_tokens=args.completion_tokens, rpm=args.rpm)
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    isolate(workdir, fixtures.server_port, llm.server_port)
+
+    pages = fixture_server.fixture_urls()
+    names = ["cnn.html", "generic_de.html" if args.translate else "foxnews.html"]
+    names += [name for name in pages if name not in names]
+    # More sources than fixtures reuse them under distinct URLs
+    urls = [pages[names[i % len(names)]] + (f"?copy={i // len(names)}" if i >= len(names) else "")
+            for i in range(args.sources)]
+    print(f"Comparing {', '.join(urls)} (work dir {workdir})")
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        level = run_level(concurrency, args.runs, urls)
+        print_level(level)
+        levels.append(level)
+
+    if output:
+        report = {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "settings": {key: value for key, value in vars(args).items() if key != "output"},
+            "urls": urls,
+            "levels": levels,
+        }
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
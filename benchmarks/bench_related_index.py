@@ -0,0 +1,96 @@
+"""Save and query cost of the related-analyses index as the archive grows.
+
+Fills a fresh store with synthetic analyses (the two-outlet corpus of
+bench_discovery.py, so each story has one or two analyses) and reports the
+latency of saving (vectorizing and clustering included) and of top-k
+related queries at several archive sizes, the time to load the index into
+a new process, and a query that recomputes TF-IDF over the whole archive
+instead, as the index replaces.
+
+    python benchmarks/bench_related_index.py --analyses 5000 --checkpoints 1000,2500,5000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_discovery import make_corpus  # noqa: E402
+
+
+def milliseconds(values):
+    values = sorted(values)
+    return (f"p50 {statistics.median(values) * 1000:6.2f} ms  "
+            f"p95 {values[int(0.95 * (len(values) - 1))] * 1000:6.2f} ms")
+
+
+def recompute_related(store, analysis_id, k):
+    """Top-k related by vectorizing every saved body for one query"""
+    import numpy as np
+    from text_vectors import tfidf
+
+    rows = store._connect().execute("SELECT id, body FROM analyses ORDER BY id").fetchall()
+    vectors = tfidf([row["body"] for row in rows])
+    position = [row["id"] for row in rows].index(analysis_id)
+    scores = (vectors @ vectors[position].T).toarray().ravel()
+    scores[position] = -1
+    return np.argsort(-scores)[:k]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--analyses", type=int, default=5000, help="analyses saved in total")
+    parser.add_argument("--checkpoints", default="1000,2500,5000", help="archive sizes to report at")
+    parser.add_argument("--queries", type=int, default=200, help="related queries per checkpoint")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_related_")
+    os.environ["ARTICLE_STORE_PATH"] = os.path.join(workdir, "saved_articles.sqlite")
+    # Keep the project's legacy files out of the benchmark store
+    os.chdir(workdir)
+    import article_store
+
+    article_store.LEGACY_JSON = os.path.join(workdir, "none.json")
+    article_store.ARTICLES_DIR = os.path.join(workdir, "none")
+    store = article_store.ArticleStore()
+
+    rng = random.Random(args.seed)
+    candidates, _ = make_corpus(args.analyses, rng)
+    bodies = [f"Headline: Story\n\n{c['text']}" for c in candidates[:args.analyses]]
+    checkpoints = {int(size) for size in args.checkpoints.split(",")}
+
+    saves, ids = [], []
+    for count, body in enumerate(bodies, 1):
+        started = time.perf_counter()
+        ids.append(store.add_analysis(body, ["https://www.a.example/x", "https://www.b.example/y"]))
+        saves.append(time.perf_counter() - started)
+        if count in checkpoints:
+            queries = []
+            for analysis_id in rng.sample(ids, min(args.queries, len(ids))):
+                started = time.perf_counter()
+                store.related(analysis_id)
+                queries.append(time.perf_counter() - started)
+            print(f"{count:>6} analyses, {store.count_clusters():>6} clusters | "
+                  f"save {milliseconds(saves[-500:])} | related {milliseconds(queries)}")
+
+    started = time.perf_counter()
+    fresh = article_store.ArticleStore(store.path)
+    fresh.related(ids[0])
+    print(f"loading the index of {len(ids)} analyses in a new process: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    started = time.perf_counter()
+    recompute_related(store, ids[0], 5)
+    print(f"one related query recomputing TF-IDF over the archive: {(time.perf_counter() - started) * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
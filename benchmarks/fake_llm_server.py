@@ -0,0 +1,179 @@
+"""Local fake of the OpenAI chat-completions endpoint.
+
+Answers POST /v1/chat/completions (streaming and non-streaming) after a
+configurable time to first token and then at a fixed token rate. With
+--rpm it enforces a requests-per-minute limit like the real API: responses
+carry x-ratelimit headers and requests over the limit get a 429 with
+retry-after-ms. Point the client at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+    python benchmarks/fake_llm_server.py --port 8200 --latency 0.5 --tokens-per-second 60
+"""
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = ("officials said the ruling would be reviewed while critics described the decision "
+          "as a significant moment in the ongoing dispute over the policy").split()
+
+# Tokens emitted per streamed chunk
+CHUNK_TOKENS = 4
+
+
+def synthesized_article(tokens):
+    """A fake article in the expected format, about tokens words long"""
+    words = [FILLER[i % len(FILLER)] for i in range(max(tokens - 3, 1))]
+    paragraphs = [" ".join(words[i:i + 60]).capitalize() + "." for i in range(0, len(words), 60)]
+    return "Headline: Benchmark synthesis of two sources\n\n\n" + "\n\n\n".join(paragraphs)
+
+
+def completion_text(body, completion_tokens):
+    messages = body.get("messages", [])
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    limit = min(completion_tokens, body.get("max_tokens") or completion_tokens)
+    if "translator" in system:
+        # Echo the text to translate, like a translation of the same length
+        text = user.split("Text to translate:", 1)[-1].strip()
+        return " ".join(text.split(" ")[:limit])
+    return synthesized_article(limit)
+
+
+class RequestWindow:
+    """Requests seen in the last minute, for the simulated rate limit"""
+
+    def __init__(self, rpm):
+        self.rpm = rpm
+        self.times = deque()
+        self.lock = threading.Lock()
+
+    def admit(self):
+        """(admitted, remaining requests, seconds until the next slot frees up)"""
+        now = time.monotonic()
+        with self.lock:
+            while self.times and now - self.times[0] >= 60:
+                self.times.popleft()
+            if len(self.times) >= self.rpm:
+                return False, 0, 60 - (now - self.times[0])
+            self.times.append(now)
+            return True, self.rpm - len(self.times), 0.0
+
+
+def make_handler(latency, tokens_per_second, completion_tokens, rpm=None):
+    window = RequestWindow(rpm) if rpm else None
+
+    class CompletionHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            self.limit_headers = {}
+            if window:
+                admitted, remaining, retry_after = window.admit()
+                self.limit_headers = {"x-ratelimit-limit-requests": str(window.rpm),
+                                      "x-ratelimit-remaining-requests": str(remaining)}
+                if not admitted:
+                    self._rate_limited(retry_after)
+                    return
+            text = completion_text(body, completion_tokens)
+            tokens = text.split(" ")
+            prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                     "total_tokens": prompt_tokens + len(tokens)}
+            base = {"id": "chatcmpl-bench", "created": int(time.time()), "model": body.get("model", "gpt-4")}
+
+            time.sleep(latency)
+            if body.get("stream"):
+                try:
+                    self._stream(base, tokens, usage)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client closed the stream early
+                    pass
+            else:
+                time.sleep(len(tokens) / tokens_per_second)
+                # Like the API, report when the text was cut off at max_tokens
+                cut = body.get("max_tokens") and len(tokens) >= body["max_tokens"]
+                payload = json.dumps({
+                    **base, "object": "chat.completion",
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                 "finish_reason": "length" if cut else "stop"}],
+                    "usage": usage,
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self._send_limit_headers()
+                self.end_headers()
+                self.wfile.write(payload)
+
+        def _send_limit_headers(self):
+            for name, value in self.limit_headers.items():
+                self.send_header(name, value)
+
+        def _rate_limited(self, retry_after):
+            payload = json.dumps({"error": {"message": "Rate limit reached", "type": "requests",
+                                            "code": "rate_limit_exceeded"}}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("retry-after-ms", str(int(retry_after * 1000)))
+            self._send_limit_headers()
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _stream(self, base, tokens, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self._send_limit_headers()
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for i in range(0, len(tokens), CHUNK_TOKENS):
+                piece = " ".join(tokens[i:i + CHUNK_TOKENS]) + (" " if i + CHUNK_TOKENS < len(tokens) else "")
+                self._event({**base, "object": "chat.completion.chunk",
+                             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+                time.sleep(CHUNK_TOKENS / tokens_per_second)
+            self._event({**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        def _event(self, data):
+            self.wfile.write(b"data: " + json.dumps(data).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return CompletionHandler
+
+
+def start_server(port=0, latency=0.5, tokens_per_second=60.0, completion_tokens=600, rpm=None):
+    """Start the server on a background thread and return it (server.server_port has the port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port),
+                                 make_handler(latency, tokens_per_second, completion_tokens, rpm))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--completion-tokens", type=int, default=600, help="length of synthesized articles")
+    parser.add_argument("--rpm", type=int, help="requests per minute before answering 429")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port),
+                                 make_handler(args.latency, args.tokens_per_second, args.completion_tokens, args.rpm))
+    print(f"Fake chat completions on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
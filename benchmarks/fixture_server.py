@@ -0,0 +1,112 @@
+"""Local stand-in for the news sites, serving the recorded HTML fixtures.
+
+Works as an HTTP proxy: point HTTP_PROXY at it and request the fixture URLs
+from fixtures/expected.json over plain http. The host of the requested URL
+picks the fixture, so the domain-specific extractors still apply. --padding-mb
+appends a large inline JSON blob after the article, like live blogs carry.
+
+    python benchmarks/fixture_server.py --port 8100 --latency 0.2
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def pad(html, padding_bytes):
+    """html with an inline JSON script of about padding_bytes inserted before </body>"""
+    if not padding_bytes:
+        return html
+    entry = b'{"id": 12345, "type": "post", "body": "' + b"x" * 200 + b'"},'
+    blob = b'<script type="application/json">[' + entry * (padding_bytes // len(entry)) + b"{}]</script>"
+    position = html.rfind(b"</body>")
+    return html[:position] + blob + html[position:] if position >= 0 else html + blob
+
+
+def load_fixtures(padding_bytes=0):
+    """Map of host name to (fixture file name, HTML bytes)"""
+    with open(os.path.join(FIXTURES_DIR, "expected.json"), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    fixtures = {}
+    for name, spec in expected.items():
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+            fixtures[urlsplit(spec["url"]).hostname] = (name, pad(f.read(), padding_bytes))
+    return fixtures
+
+
+def fixture_urls(scheme="http"):
+    """Fixture name -> URL to request through the proxy"""
+    with open(os.path.join(FIXTURES_DIR, "expected.json"), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    return {name: spec["url"].replace("https://", f"{scheme}://", 1) for name, spec in expected.items()}
+
+
+def make_handler(fixtures, latency):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            # Proxied requests carry the absolute URL, direct ones just /<fixture name>
+            parts = urlsplit(self.path)
+            fixture = fixtures.get(parts.hostname) if parts.hostname else None
+            if fixture is None:
+                fixture = next((f for f in fixtures.values() if f[0] == parts.path.lstrip("/")), None)
+            if fixture is None:
+                self.send_error(404, "No fixture for this URL")
+                return
+
+            time.sleep(latency)
+            etag = '"{}"'.format(hashlib.sha1(fixture[1]).hexdigest()[:16])
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(fixture[1])))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            try:
+                self.wfile.write(fixture[1])
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading once it had the article
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start_server(port=0, latency=0.0, padding_bytes=0):
+    """Start the server on a background thread and return it (server.server_port has the port)"""
+    import threading
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(load_fixtures(padding_bytes), latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--padding-mb", type=float, default=0.0, help="inline JSON added to every page")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(int(args.padding_mb * 1024 * 1024))
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(fixtures, args.latency))
+    print(f"Serving fixtures as an HTTP proxy on http://127.0.0.1:{args.port}")
+    for name, url in fixture_urls().items():
+        print(f"  {url}  ->  {name}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
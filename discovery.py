@@ -0,0 +1,252 @@
+"""Find stories several outlets cover and pair them up for comparison.
+
+Reads the outlets' RSS or Atom feeds and news sitemaps (URLs or local
+files), extracts every linked article through the normal scraping path and
+pairs articles of different outlets whose TF-IDF vectors are similar enough.
+The pairs are written as JSONL in the format batch.py reads, and --compare
+runs them through the comparison pipeline right away.
+
+    python discovery.py https://rss.cnn.com/rss/edition.rss feeds/foxnews_sitemap.xml \\
+        --output pairs.jsonl --compare results.jsonl
+
+Articles are compared in the language they were published in, so only
+outlets writing in the same language are paired.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+# Settings are read from the environment when the modules below are
+# imported, so .env has to be loaded first
+load_dotenv()
+
+import fetcher  # noqa: E402
+from fetcher import pair_id  # noqa: E402
+from scraper_cnn import scrape_article  # noqa: E402
+from text_vectors import similar_pairs, tfidf  # noqa: E402
+
+# Minimum cosine similarity of two articles to count as the same story
+DISCOVERY_THRESHOLD = float(os.getenv("DISCOVERY_THRESHOLD", "0.3"))
+# Articles published further apart than this are never paired (0 turns the check off)
+DISCOVERY_WINDOW_HOURS = float(os.getenv("DISCOVERY_WINDOW_HOURS", "48"))
+# Newest entries taken from each feed, and seconds allowed for extracting all of them
+DISCOVERY_MAX_ITEMS = int(os.getenv("DISCOVERY_MAX_ITEMS", "100"))
+DISCOVERY_DEADLINE = float(os.getenv("DISCOVERY_DEADLINE", "300"))
+
+# Second-level labels under which outlets register their names, as in bbc.co.uk
+_SHARED_SECOND_LEVEL = {"co", "com", "org", "net", "gov", "ac"}
+
+
+def outlet_of(url):
+    """Name of the outlet publishing url, e.g. "cnn.com" for edition.cnn.com"""
+    labels = (urlsplit(url).hostname or "").split(".")
+    keep = 3 if len(labels) > 2 and labels[-2] in _SHARED_SECOND_LEVEL else 2
+    return ".".join(labels[-keep:])
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(element, *names):
+    for child in element:
+        if _local_name(child.tag) in names and child.text and child.text.strip():
+            return child.text.strip()
+    return None
+
+
+def _timestamp(value):
+    """Seconds since the epoch of an RFC 822 or ISO 8601 date, None if it is neither"""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _atom_link(entry):
+    for child in entry:
+        if _local_name(child.tag) == "link" and child.get("rel", "alternate") == "alternate":
+            return child.get("href")
+    return None
+
+
+def parse_feed(data):
+    """Entries of an RSS feed, Atom feed or sitemap, and the sitemaps a sitemap index lists.
+
+    Returns (entries, sitemaps); every entry has a url, a title (None in
+    plain sitemaps) and a published timestamp (None when unknown).
+    """
+    root = ElementTree.fromstring(data)
+    entries, sitemaps = [], []
+    for element in root.iter():
+        kind = _local_name(element.tag)
+        if kind == "item":
+            url = _child_text(element, "link")
+            title, published = _child_text(element, "title"), _child_text(element, "pubDate", "date")
+        elif kind == "entry":
+            url = _atom_link(element)
+            title, published = _child_text(element, "title"), _child_text(element, "published", "updated")
+        elif kind == "url":
+            url = _child_text(element, "loc")
+            news = next((child for child in element if _local_name(child.tag) == "news"), None)
+            title = _child_text(news, "title") if news is not None else None
+            published = (_child_text(news, "publication_date") if news is not None else None) \
+                or _child_text(element, "lastmod")
+        elif kind == "sitemap":
+            url = _child_text(element, "loc")
+            if url:
+                sitemaps.append(url)
+            continue
+        else:
+            continue
+        if url:
+            entries.append({"url": url, "title": title, "published": _timestamp(published)})
+    return entries, sitemaps
+
+
+def _load(source):
+    if os.path.exists(source):
+        with open(source, "rb") as f:
+            return f.read()
+    return fetcher.fetch_url(source).content
+
+
+def read_feed(source, max_items=None, depth=1):
+    """Newest entries of a feed or sitemap given by URL or file path.
+
+    Sitemap indexes are followed depth levels down.
+    """
+    max_items = max_items or DISCOVERY_MAX_ITEMS
+    entries, sitemaps = parse_feed(_load(source))
+    if depth > 0:
+        for sitemap in sitemaps:
+            try:
+                entries.extend(read_feed(sitemap, max_items, depth - 1))
+            except Exception as e:
+                print(f"Skipping sitemap {sitemap}: {e}", file=sys.stderr)
+    entries.sort(key=lambda entry: entry["published"] or 0, reverse=True)
+    return entries[:max_items]
+
+
+def collect_candidates(sources, max_items=None):
+    """Articles linked from all feeds, extracted through the scraping path.
+
+    Entries that fail to download or hold no article are left out.
+    """
+    entries = {}
+    for source in sources:
+        try:
+            for entry in read_feed(source, max_items):
+                entries.setdefault(entry["url"], entry)
+        except Exception as e:
+            print(f"Skipping feed {source}: {e}", file=sys.stderr)
+
+    entries = list(entries.values())
+    results = fetcher.fetch_all([entry["url"] for entry in entries], worker=scrape_article,
+                                deadline=DISCOVERY_DEADLINE)
+    candidates = []
+    for entry, (text, error) in zip(entries, results):
+        if error is not None or not text:
+            print(f"Skipping {entry['url']}: {error or 'no article found'}", file=sys.stderr)
+            continue
+        candidates.append({**entry, "outlet": outlet_of(entry["url"]), "text": text})
+    return candidates
+
+
+def pair_stories(candidates, threshold=None, window_hours=None):
+    """Pairs of articles from different outlets that cover the same story, most similar first.
+
+    Titles count along with the text. Each article is paired at most once
+    per other outlet, with its most similar match above threshold.
+    """
+    import numpy as np
+
+    threshold = DISCOVERY_THRESHOLD if threshold is None else threshold
+    window = (DISCOVERY_WINDOW_HOURS if window_hours is None else window_hours) * 3600
+    if not candidates:
+        return []
+
+    vectors = tfidf([f"{c['title'] or ''}\n\n{c['text']}" for c in candidates])
+    published = np.array([c["published"] if c["published"] is not None else np.nan for c in candidates])
+    by_outlet = {}
+    for index, candidate in enumerate(candidates):
+        by_outlet.setdefault(candidate["outlet"], []).append(index)
+
+    pairs = []
+    outlets = sorted(by_outlet)
+    for n, first in enumerate(outlets):
+        for second in outlets[n + 1:]:
+            left, right = np.array(by_outlet[first]), np.array(by_outlet[second])
+            rows, cols, similarities = similar_pairs(vectors[left], vectors[right], threshold)
+            rows, cols = left[rows], right[cols]
+            if window:
+                # Unknown dates compare as NaN and are never excluded
+                keep = ~(np.abs(published[rows] - published[cols]) > window)
+                rows, cols, similarities = rows[keep], cols[keep], similarities[keep]
+
+            # Best matches first; an article already paired with this outlet is skipped
+            used = set()
+            for i in np.argsort(-similarities, kind="stable"):
+                a, b = int(rows[i]), int(cols[i])
+                if a in used or b in used:
+                    continue
+                used.update((a, b))
+                urls = [candidates[a]["url"], candidates[b]["url"]]
+                pairs.append({"id": pair_id(urls), "urls": urls,
+                              "titles": [candidates[a]["title"], candidates[b]["title"]],
+                              "similarity": round(float(similarities[i]), 3)})
+    pairs.sort(key=lambda pair: -pair["similarity"])
+    return pairs
+
+
+def write_pairs(pairs, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for pair in pairs:
+            f.write(json.dumps(pair, ensure_ascii=False) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pair same-story articles of different outlets from their feeds")
+    parser.add_argument("feeds", nargs="+", help="RSS/Atom feeds or sitemaps, as URLs or file paths")
+    parser.add_argument("--output", default="pairs.jsonl", help="JSONL file the pairs are written to")
+    parser.add_argument("--threshold", type=float, default=DISCOVERY_THRESHOLD,
+                        help="minimum cosine similarity of a pair")
+    parser.add_argument("--window-hours", type=float, default=DISCOVERY_WINDOW_HOURS,
+                        help="maximum hours between the publication of paired articles (0: any)")
+    parser.add_argument("--max-items", type=int, default=DISCOVERY_MAX_ITEMS, help="newest entries read per feed")
+    parser.add_argument("--compare", metavar="RESULTS", help="compare the pairs with batch.py, appending to RESULTS")
+    parser.add_argument("--concurrency", type=int, default=4, help="comparisons running at once with --compare")
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    candidates = collect_candidates(args.feeds, args.max_items)
+    pairs = pair_stories(candidates, args.threshold, args.window_hours)
+    write_pairs(pairs, args.output)
+    print(f"{len(candidates)} articles from {len({c['outlet'] for c in candidates})} outlets, "
+          f"{len(pairs)} pairs written to {args.output} in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+    if args.compare and pairs:
+        from batch import run_batch
+
+        counts = run_batch(args.output, args.compare, concurrency=args.concurrency)
+        print(f"Compared: {counts['ok']} ok, {counts['error']} failed", file=sys.stderr)
+        return 0 if counts["error"] == 0 else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
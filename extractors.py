@@ -0,0 +1,266 @@
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+import metrics
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:  # optional, html.parser is slower but always there
+    PARSER = "html.parser"
+
+# Tags that never hold article text in the generic extractor
+BOILERPLATE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "figure", "svg"]
+
+# Elements without an end tag, and elements whose start implicitly closes an open <p>
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+CLOSES_P = {"p", "div", "ul", "ol", "dl", "table", "blockquote", "pre", "section", "article", "aside",
+            "header", "footer", "figure", "form", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+_registry = {}
+
+
+class Extractor:
+    """Site-specific extraction: parse only the strained nodes, then select paragraphs.
+
+    strainer limits the tree BeautifulSoup builds to the nodes holding the
+    article; selector (compiled once) picks the paragraph elements within it.
+    body and paragraph are the same rules as (tag, attribute, value) for the
+    streaming parser, which reads paragraphs inside the body element
+    (direct children only when direct is set) and stops when it closes.
+    """
+
+    def __init__(self, name, domains, strainer, selector, skip=None, body=None, paragraph=("p", None, None),
+                 direct=False):
+        self.name = name
+        self.domains = domains
+        self.strainer = strainer
+        self.selector = soupsieve.compile(selector)
+        self.skip = skip
+        self.body = body
+        self.paragraph = paragraph
+        self.direct = direct
+
+    def extract(self, html):
+        """Return the article paragraphs found in html, or an empty list"""
+        soup = BeautifulSoup(html, PARSER, parse_only=self.strainer)
+        paragraphs = [node.get_text() for node in self.selector.select(soup)]
+        return [p for p in paragraphs if p.strip() and not (self.skip and self.skip(p))]
+
+    def stream_parser(self):
+        """A fresh ParagraphStream for this site, or None without streaming rules"""
+        if self.body is None:
+            return None
+        return ParagraphStream(self.body, self.paragraph, self.direct, self.skip)
+
+
+def _matches(rule, tag, attrs):
+    name, attribute, value = rule
+    if tag != name:
+        return False
+    if attribute is None:
+        return True
+    found = dict(attrs).get(attribute) or ""
+    return value in found.split() if attribute == "class" else found == value
+
+
+class ParagraphStream(HTMLParser):
+    """Incremental paragraph extraction from HTML fed in chunks.
+
+    Collects the text of paragraph elements inside the first element
+    matching body; finished paragraphs are handed out by take() as soon as
+    their element closes, and done is set once the body element closes.
+    """
+
+    def __init__(self, body, paragraph, direct=False, skip=None):
+        super().__init__(convert_charrefs=True)
+        self.body = body
+        self.paragraph = paragraph
+        self.direct = direct
+        self.skip = skip
+        self.done = False
+        self.found = 0
+        self._open = None  # elements open inside the body, the body itself first
+        self._text = None
+        self._paragraph_depth = None
+        self._script_depth = None
+        self._ready = []
+
+    def take(self):
+        """Paragraphs finished since the last call"""
+        ready, self._ready = self._ready, []
+        return ready
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if self._open is None:
+            if _matches(self.body, tag, attrs):
+                self._open = [tag]
+            return
+        if tag in VOID_TAGS:
+            return
+        if tag in CLOSES_P and self._open[-1] == "p":
+            self.handle_endtag("p")
+        self._open.append(tag)
+        depth = len(self._open)
+        if self._text is None and _matches(self.paragraph, tag, attrs) and (not self.direct or depth == 2):
+            self._text, self._paragraph_depth = [], depth
+        if tag in ("script", "style") and self._script_depth is None:
+            self._script_depth = depth
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags hold no text
+        pass
+
+    def handle_endtag(self, tag):
+        if self.done or self._open is None or tag not in self._open:
+            return
+        # Close everything up to the matching element, like a browser would
+        while self._open:
+            depth = len(self._open)
+            closed = self._open.pop()
+            if self._script_depth is not None and depth <= self._script_depth:
+                self._script_depth = None
+            if self._paragraph_depth is not None and depth <= self._paragraph_depth:
+                self._finish_paragraph()
+            if closed == tag:
+                break
+        if not self._open:
+            self.done = True
+
+    def handle_data(self, data):
+        if self._text is not None and self._script_depth is None:
+            self._text.append(data)
+
+    def _finish_paragraph(self):
+        paragraph = "".join(self._text)
+        self._text = self._paragraph_depth = None
+        if paragraph.strip() and not (self.skip and self.skip(paragraph)):
+            self._ready.append(paragraph)
+            self.found += 1
+
+
+def register_extractor(extractor):
+    """Use extractor for every domain (and subdomain) it lists"""
+    for domain in extractor.domains:
+        _registry[domain] = extractor
+    return extractor
+
+
+def get_extractor(url):
+    """The registered extractor for url's domain or one of its parent domains"""
+    host = (urlsplit(url).hostname or "").lower() if url else ""
+    labels = host.split(".")
+    for i in range(len(labels) - 1):
+        extractor = _registry.get(".".join(labels[i:]))
+        if extractor:
+            return extractor
+    return None
+
+
+def can_stream(url):
+    """Whether url's site has rules to extract its article while the page is still arriving"""
+    extractor = get_extractor(url)
+    return extractor is not None and extractor.body is not None
+
+
+def _is_promo(paragraph):
+    # Fox interleaves all-caps calls to action ("CLICK HERE TO GET THE FOX NEWS APP")
+    letters = [c for c in paragraph if c.isalpha()]
+    return bool(letters) and all(c.isupper() for c in letters)
+
+
+register_extractor(Extractor(
+    "cnn",
+    ["cnn.com"],
+    SoupStrainer("div", attrs={"data-component": "text-block"}),
+    selector='div[data-component="text-block"]',
+    body=("div", "class", "article__content"),
+    paragraph=("div", "data-component", "text-block"),
+))
+
+register_extractor(Extractor(
+    "foxnews",
+    ["foxnews.com", "foxbusiness.com"],
+    SoupStrainer("div", attrs={"class": "article-body"}),
+    selector="div.article-body > p",
+    skip=_is_promo,
+    body=("div", "class", "article-body"),
+    direct=True,
+))
+
+
+def _link_density(node):
+    text_length = len(node.get_text(strip=True)) or 1
+    link_length = sum(len(a.get_text(strip=True)) for a in node.find_all("a"))
+    return link_length / text_length
+
+
+def generic_extract(html):
+    """Density-based fallback: paragraphs of the container holding the most prose"""
+    soup = BeautifulSoup(html, PARSER)
+    for tag in soup.find_all(BOILERPLATE_TAGS):
+        tag.decompose()
+
+    # Score each paragraph's parent by the prose it contributes, discounting link lists
+    containers, scores = {}, {}
+    for p in soup.find_all("p"):
+        text = p.get_text(strip=True)
+        if len(text) < 25:
+            continue
+        key = id(p.parent)
+        containers[key] = p.parent
+        scores[key] = scores.get(key, 0) + len(text) * (1 - _link_density(p))
+
+    if not scores:
+        return []
+    best = containers[max(scores, key=scores.get)]
+    return [p.get_text() for p in best.find_all("p", recursive=False) if p.get_text(strip=True)]
+
+
+def extract_paragraphs(html, url=None):
+    """Article paragraphs of a page, using the site extractor when there is one"""
+    extractor = get_extractor(url)
+    if extractor:
+        paragraphs = extractor.extract(html)
+        if paragraphs:
+            return paragraphs
+    return generic_extract(html)
+
+
+def stream_paragraphs(chunks, url=None):
+    """Article paragraphs of a page arriving as text chunks, yielded as they are parsed.
+
+    With a streaming rule for url's site, reading stops once the article body
+    closes and nothing but the current chunk is held in memory. Otherwise,
+    or when the rule finds nothing, the chunks read are parsed as a whole
+    with extract_paragraphs.
+    """
+    extractor = get_extractor(url)
+    parser = extractor.stream_parser() if extractor else None
+    received = []
+    for chunk in chunks:
+        if parser is None or not parser.found:
+            received.append(chunk)
+        if parser is not None:
+            with metrics.span("parse"):
+                parser.feed(chunk)
+            paragraphs = parser.take()
+            if paragraphs:
+                received.clear()
+                yield from paragraphs
+            if parser.done:
+                break
+
+    if parser is not None:
+        parser.close()
+        yield from parser.take()
+        if parser.found:
+            return
+    with metrics.span("parse"):
+        paragraphs = extract_paragraphs("".join(received), url)
+    yield from paragraphs
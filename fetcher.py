@@ -0,0 +1,192 @@
+import codecs
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import metrics
+
+# Per-request timeout (seconds) and overall deadline for one fetch stage
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+FETCH_DEADLINE = float(os.getenv("FETCH_DEADLINE", "25"))
+
+# Keep-alive pool sizing: number of hosts kept and connections per host
+POOL_HOSTS = int(os.getenv("FETCH_POOL_HOSTS", "16"))
+POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "8"))
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "16"))
+
+# Pages are read in chunks and parsed as they arrive (FETCH_STREAMING=0 reads
+# them whole); no more than FETCH_MAX_MB is ever read from one response
+FETCH_STREAMING = os.getenv("FETCH_STREAMING", "1") != "0"
+FETCH_MAX_BYTES = int(float(os.getenv("FETCH_MAX_MB", "5")) * 1024 * 1024)
+FETCH_CHUNK_BYTES = 64 * 1024
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+_session = None
+_session_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+
+class DomainThrottle:
+    """Politeness limits per domain: concurrent requests and spacing between them"""
+
+    def __init__(self, max_concurrent=None, min_interval=0.0):
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    def _slot(self, domain):
+        with self._lock:
+            if domain not in self._slots:
+                self._slots[domain] = threading.BoundedSemaphore(self.max_concurrent)
+            return self._slots[domain]
+
+    def _wait_turn(self, domain):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(domain, now))
+            self._next_start[domain] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def run(self, url, fn):
+        """Call fn() once the domain of url is allowed another request"""
+        domain = (urlsplit(url).hostname or "").lower()
+        if self.max_concurrent:
+            with self._slot(domain):
+                self._wait_turn(domain)
+                return fn()
+        self._wait_turn(domain)
+        return fn()
+
+
+class PageTooLarge(Exception):
+    """The page is bigger than FETCH_MAX_MB and no article was found within the limit"""
+
+
+_throttle = DomainThrottle()
+
+# Client errors that may pass on a later try: request timeout, rate limited
+RETRYABLE_STATUS = (408, 429)
+
+
+def is_permanent(error):
+    """Whether a failed download will fail the same way when retried"""
+    from requests.exceptions import HTTPError, InvalidSchema, InvalidURL, MissingSchema
+
+    if isinstance(error, (PageTooLarge, InvalidURL, InvalidSchema, MissingSchema)):
+        return True
+    if isinstance(error, HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return 400 <= status < 500 and status not in RETRYABLE_STATUS
+    return False
+
+
+def configure_politeness(max_per_domain=None, min_interval=0.0):
+    """Limit concurrent requests per domain and enforce a delay between their starts"""
+    global _throttle
+    _throttle = DomainThrottle(max_per_domain, min_interval)
+
+
+def get_session():
+    """Return the process-wide HTTP session with a keep-alive pool per host"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # Imported here so importing the pipeline does not pay for requests
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def fetch_url(url, headers=None, timeout=None, **kwargs):
+    """GET a URL over the shared session and raise on HTTP errors"""
+    response = _throttle.run(
+        url, lambda: get_session().get(url, headers=headers, timeout=timeout or FETCH_TIMEOUT, **kwargs)
+    )
+    response.raise_for_status()
+    return response
+
+
+def open_stream(url, headers=None, timeout=None, max_bytes=None, partial_ok=False):
+    """GET a URL without reading the body yet.
+
+    Unless partial_ok (the caller can use the first max_bytes of a page),
+    bodies whose Content-Length exceeds max_bytes are refused before any of
+    them is read. The caller must close the response (use it as a context
+    manager).
+    """
+    max_bytes = max_bytes or FETCH_MAX_BYTES
+    response = fetch_url(url, headers=headers, timeout=timeout, stream=True)
+    length = response.headers.get("Content-Length", "")
+    if not partial_ok and length.isdigit() and int(length) > max_bytes:
+        response.close()
+        raise PageTooLarge(f"{url} is {int(length)} bytes, over the {max_bytes} byte limit")
+    return response
+
+
+def iter_text(response, max_bytes=None, encoding="utf-8"):
+    """Yield the body of a streamed response as decoded text chunks, up to max_bytes.
+
+    Sets response.truncated when the limit cut the body short.
+    """
+    max_bytes = max_bytes or FETCH_MAX_BYTES
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    chunks = response.iter_content(FETCH_CHUNK_BYTES)
+    received = 0
+    response.truncated = False
+    while True:
+        with metrics.span("fetch"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        chunk = chunk[:max_bytes - received]
+        received += len(chunk)
+        metrics.count("bytes_downloaded", len(chunk))
+        yield decoder.decode(chunk)
+        if received >= max_bytes:
+            response.truncated = True
+            break
+    yield decoder.decode(b"", final=True)
+
+
+def pair_id(urls):
+    """Stable ID for a comparison of urls, independent of their order"""
+    return hashlib.sha256("\n".join(sorted(urls)).encode("utf-8")).hexdigest()[:16]
+
+
+def fetch_all(urls, worker=fetch_url, deadline=None):
+    """Run worker(url) for every URL in parallel.
+
+    Returns a list of (result, error) tuples in the order of urls. Sources
+    still running when the overall deadline expires get a TimeoutError.
+    """
+    deadline = FETCH_DEADLINE if deadline is None else deadline
+    futures = [metrics.submit(_pool, worker, url) for url in urls]
+    wait(futures, timeout=deadline)
+
+    results = []
+    for future in futures:
+        if not future.done():
+            future.cancel()
+            results.append((None, TimeoutError(f"no response within {deadline:g}s")))
+        elif future.exception() is not None:
+            results.append((None, future.exception()))
+        else:
+            results.append((future.result(), None))
+    return results
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fetcher import pair_id
+from scraper_cnn import stream_article_from_urls
+
+# Comparisons running at once across all sessions, and how long finished jobs are kept
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", "3600"))
+
+_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_jobs = {}
+# Queued and running jobs by pair_id, so identical comparisons are joined
+_running = {}
+_lock = threading.Lock()
+
+
+class Job:
+    """One comparison running in the background, shared by every session that asked for it.
+
+    id is unique to this run, so a later run of the same URLs never takes
+    over a session still following this one; key is the pair_id. status
+    moves from "queued" to "running" to "done" or "error"; while running,
+    stage names the pipeline step and content holds the article written so
+    far.
+    """
+
+    def __init__(self, urls):
+        self.id = uuid.uuid4().hex
+        self.key = pair_id(urls)
+        self.urls = list(urls)
+        self.status = "queued"
+        self.created = time.time()
+        self.finished = None
+        self.stream = stream_article_from_urls(*self.urls)
+        self.future = None
+
+    @property
+    def stage(self):
+        return self.stream.stage
+
+    @property
+    def content(self):
+        return self.stream.content
+
+    @property
+    def error(self):
+        return self.stream.error
+
+    @property
+    def done(self):
+        return self.status in ("done", "error")
+
+    def progress(self):
+        """Short description of where the job is"""
+        if self.status == "queued":
+            return "Waiting for a free worker..."
+        if self.status == "error":
+            return self.error
+        if self.status == "done":
+            return "Analysis completed"
+        if self.stage == "synthesize":
+            words = len(self.content.split())
+            return f"Writing the article ({words} words so far)..." if words else "Writing the article..."
+        return {"fetch": "Downloading articles...", "translate": "Detecting language and translating...",
+                "map": "Condensing each source to its facts..."}.get(self.stage, "Starting...")
+
+    def wait(self, timeout=None):
+        """Block until the job has finished"""
+        self.future.result(timeout)
+        return self
+
+    def _run(self):
+        self.status = "running"
+        try:
+            for _ in self.stream:
+                pass
+        finally:
+            self.status = "error" if self.stream.error or self.stream.unified_file is None else "done"
+            self.finished = time.time()
+            with _lock:
+                if _running.get(self.key) is self:
+                    del _running[self.key]
+
+
+def _expire():
+    cutoff = time.time() - JOB_RETENTION
+    for job_id in [job_id for job_id, job in _jobs.items() if job.done and job.finished < cutoff]:
+        del _jobs[job_id]
+
+
+def submit(urls):
+    """Start comparing urls in the background, or join the job already running for them"""
+    with _lock:
+        _expire()
+        job = _running.get(pair_id(urls))
+        if job is not None:
+            return job
+        job = Job(urls)
+        _jobs[job.id] = _running[job.key] = job
+        job.future = _pool.submit(job._run)
+        return job
+
+
+def get_job(job_id):
+    """The job with job_id, or None once it has expired (or never existed)"""
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def active_jobs():
+    """Number of queued and running jobs"""
+    with _lock:
+        return sum(not job.done for job in _jobs.values())
@@ -0,0 +1,355 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from contextlib import aclosing
+
+import metrics
+from disk_cache import DiskCache
+from tokens import count_tokens
+
+# Completions are cached by a hash of (model, messages, parameters)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "128")) * 1024 * 1024)
+
+# Account limits to start from; rate-limit headers of the API replace them
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))
+LLM_TPM = float(os.getenv("LLM_TPM", "40000"))
+# Requests in flight at once, retries of transient failures and seconds per call
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "1.0"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+_cache = None
+_client = None
+_client_lock = threading.Lock()
+_loop = None
+_limiter = None
+_semaphore = None
+
+
+class CompletionTruncated(Exception):
+    """The completion hit max_tokens and stops mid-text"""
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, refilled continuously.
+
+    The bucket sizes follow the limits the API reports in x-ratelimit
+    headers, and the remaining counts it reports replace the local
+    estimate, so capacity used by other processes on the same key is
+    accounted for. Only used from the event loop of this module.
+    """
+
+    def __init__(self, rpm, tpm):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = rpm
+        self.tokens = tpm
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens):
+        """Wait until a request of about tokens tokens fits both buckets, then take it"""
+        async with self._lock:
+            while True:
+                self._refill()
+                # A request larger than the whole bucket only waits for a full one
+                needed = min(tokens, self.tpm)
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0:
+                    if self.requests >= 1 and self.tokens >= needed:
+                        self.requests -= 1
+                        self.tokens -= needed
+                        return
+                    wait = max((1 - self.requests) * 60 / self.rpm, (needed - self.tokens) * 60 / self.tpm)
+                await asyncio.sleep(wait)
+
+    def update(self, headers):
+        """Adopt the limits and remaining capacity reported in rate-limit headers"""
+        self._refill()
+        for kind in ("requests", "tokens"):
+            limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+            remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+            if limit:
+                setattr(self, "rpm" if kind == "requests" else "tpm", limit)
+            if remaining is not None:
+                setattr(self, kind, min(getattr(self, kind), remaining))
+
+    def pause(self, seconds):
+        """Hold every request back for seconds, e.g. after a 429"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def _header_number(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(headers):
+    milliseconds = _header_number(headers, "retry-after-ms")
+    if milliseconds is not None:
+        return milliseconds / 1000
+    return _header_number(headers, "retry-after")
+
+
+def _get_loop():
+    """Event loop running the async layer on a daemon thread, started on first use"""
+    global _loop
+    if _loop is None:
+        with _client_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def get_async_client():
+    """The process-wide AsyncOpenAI client; its connection pool is shared by all sessions"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import AsyncOpenAI
+
+                # The entry points load .env before importing this module;
+                # retries are done here, with the rate limiter in the loop
+                _client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0)
+    return _client
+
+
+def _get_limits():
+    global _limiter, _semaphore
+    if _limiter is None:
+        _limiter = RateLimiter(LLM_RPM, LLM_TPM)
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _limiter, _semaphore
+
+
+def run_sync(coro):
+    """Run a coroutine of this module on its event loop and wait for the result.
+
+    Metrics recorded by the coroutine go to the caller's current run.
+    """
+    run = metrics.current_run()
+
+    async def in_run():
+        with metrics.collect(run):
+            return await coro
+
+    return asyncio.run_coroutine_threadsafe(in_run(), _get_loop()).result()
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = DiskCache("completions.sqlite", LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL)
+    return _cache
+
+
+def completion_key(model, messages, params, unordered=None, cache_tag=None):
+    """Content hash identifying a completion request.
+
+    When unordered is given, the user messages are left out of the key and
+    replaced by the sorted unordered inputs, so the same sources in a
+    different order map to the same entry. The prompt must then be fully
+    determined by those inputs and cache_tag.
+    """
+    if unordered is not None:
+        messages = [m for m in messages if m["role"] == "system"]
+    payload = {
+        "model": model,
+        "messages": messages,
+        "params": params,
+        "unordered": sorted(unordered) if unordered is not None else None,
+        "tag": cache_tag,
+    }
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _count_usage(usage):
+    if usage is not None:
+        metrics.count("prompt_tokens", usage.prompt_tokens or 0)
+        metrics.count("completion_tokens", usage.completion_tokens or 0)
+
+
+def _estimate_tokens(messages, params):
+    """Tokens a request counts against the limit: prompt plus the completion allowance"""
+    prompt = sum(count_tokens(m["content"]) for m in messages)
+    return prompt + (params.get("max_tokens") or 1000)
+
+
+def _retry_delay(error, attempt, limiter):
+    """Seconds to wait before retrying after error, or None when retrying cannot help"""
+    import openai
+
+    if isinstance(error, openai.APIStatusError):
+        status = error.status_code
+        if status not in (408, 409, 429) and status < 500:
+            return None
+        limiter.update(error.response.headers)
+        delay = _retry_after(error.response.headers)
+        if status == 429:
+            # Everyone waits, not only the request that hit the limit
+            delay = delay if delay is not None else LLM_BACKOFF * 2 ** attempt
+            limiter.pause(delay)
+        if delay is not None:
+            return delay
+    elif not isinstance(error, (openai.APIConnectionError, TimeoutError)):
+        return None
+    return min(LLM_BACKOFF * 2 ** attempt, 60) * random.uniform(0.5, 1.5)
+
+
+async def _create(model, messages, params, timeout):
+    """One completion with rate limiting, a per-attempt timeout and jittered retries"""
+    limiter, semaphore = _get_limits()
+    estimate = _estimate_tokens(messages, params)
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        await limiter.acquire(estimate)
+        try:
+            async with semaphore:
+                raw = await asyncio.wait_for(
+                    get_async_client().chat.completions.with_raw_response.create(
+                        model=model, messages=messages, **params),
+                    timeout)
+            limiter.update(raw.headers)
+            return raw.parse()
+        except Exception as e:
+            delay = _retry_delay(e, attempt, limiter)
+            if delay is None or attempt == LLM_MAX_RETRIES:
+                raise
+        await asyncio.sleep(delay)
+
+
+async def _create_stream(model, messages, params, timeout):
+    """Yield the chunks of a streamed completion; retried like _create until the first chunk.
+
+    timeout bounds the wait for the response and for every chunk after it.
+    """
+    limiter, semaphore = _get_limits()
+    estimate = _estimate_tokens(messages, params)
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        await limiter.acquire(estimate)
+        started = False
+        try:
+            async with semaphore:
+                # The final chunk then carries the token usage of the whole stream
+                raw = await asyncio.wait_for(
+                    get_async_client().chat.completions.with_raw_response.create(
+                        model=model, messages=messages, stream=True,
+                        stream_options={"include_usage": True}, **params),
+                    timeout)
+                limiter.update(raw.headers)
+                stream = raw.parse()
+                try:
+                    chunks = stream.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                        except StopAsyncIteration:
+                            return
+                        started = True
+                        yield chunk
+                finally:
+                    await stream.close()
+        except Exception as e:
+            # Text already handed out cannot be taken back
+            delay = None if started else _retry_delay(e, attempt, limiter)
+            if delay is None or attempt == LLM_MAX_RETRIES:
+                raise
+        await asyncio.sleep(delay)
+
+
+async def achat_completion(model, messages, unordered=None, cache_tag=None, timeout=None,
+                           complete=False, **params):
+    """Return the completion text for a chat request, served from cache when possible.
+
+    With complete, a completion cut off at max_tokens raises
+    CompletionTruncated instead of being returned (and is not cached).
+    Must run on this module's event loop, e.g. through run_sync.
+    """
+    key = completion_key(model, messages, params, unordered, cache_tag) if LLM_CACHE_ENABLED else None
+    if key:
+        cached = _get_cache().get(key)
+        if cached is not None:
+            metrics.count("llm_cache_hits")
+            return cached[0]
+
+    response = await _create(model, messages, params, timeout or LLM_TIMEOUT)
+    content = response.choices[0].message.content
+    _count_usage(response.usage)
+    if complete and response.choices[0].finish_reason == "length":
+        raise CompletionTruncated(f"completion reached max_tokens={params.get('max_tokens')}")
+
+    if key and content:
+        _get_cache().set(key, content)
+    return content
+
+
+async def astream_chat_completion(model, messages, unordered=None, cache_tag=None, timeout=None, **params):
+    """Yield the completion text in deltas as the model produces them.
+
+    A cached completion is yielded in one piece; a fresh one is stored once
+    the stream has finished. Must run on this module's event loop.
+    """
+    key = completion_key(model, messages, params, unordered, cache_tag) if LLM_CACHE_ENABLED else None
+    if key:
+        cached = _get_cache().get(key)
+        if cached is not None:
+            metrics.count("llm_cache_hits")
+            yield cached[0]
+            return
+
+    parts = []
+    # Closing this generator early releases the request's concurrency slot
+    async with aclosing(_create_stream(model, messages, params, timeout or LLM_TIMEOUT)) as chunks:
+        async for chunk in chunks:
+            _count_usage(getattr(chunk, "usage", None))
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+    if key and parts:
+        _get_cache().set(key, "".join(parts))
+
+
+def chat_completion(model, messages, unordered=None, cache_tag=None, timeout=None, complete=False, **params):
+    """Blocking achat_completion, for code running outside the event loop"""
+    return run_sync(achat_completion(model, messages, unordered, cache_tag, timeout, complete, **params))
+
+
+def stream_chat_completion(model, messages, unordered=None, cache_tag=None, timeout=None, **params):
+    """Blocking astream_chat_completion: yields the deltas in the calling thread"""
+    deltas = astream_chat_completion(model, messages, unordered, cache_tag, timeout, **params)
+    try:
+        while True:
+            try:
+                yield run_sync(deltas.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(deltas.aclose())
+
+
+def cache_stats():
+    """Hit/miss counters and size of the completion cache"""
+    return _get_cache().stats()
@@ -0,0 +1,174 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Pipeline stages in the order they run
+STAGES = ("fetch", "parse", "clean", "detect", "translate", "map", "reduce", "synthesize", "save")
+# Counters recorded per run
+COUNTERS = ("bytes_downloaded", "paragraphs", "shared_paragraphs", "trimmed_paragraphs",
+            "prompt_tokens", "completion_tokens", "page_cache_hits", "llm_cache_hits")
+
+# Finished runs are exported here: Prometheus text format when the path ends
+# in .prom (rewritten with running totals), one JSON line per run otherwise
+METRICS_SINK = os.getenv("METRICS_SINK")
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+_export_lock = threading.Lock()
+_totals = {"runs": {}, "stages": {}, "counters": {}}
+
+
+class RunMetrics:
+    """Timed spans recorded while one comparison runs"""
+
+    def __init__(self):
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage, start, end):
+        with self._lock:
+            self.spans.append((stage, start, end))
+
+    def incr(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def stage_times(self):
+        """Wall-clock seconds per stage; overlapping spans of parallel workers count once"""
+        intervals = {}
+        with self._lock:
+            for stage, start, end in self.spans:
+                intervals.setdefault(stage, []).append((start, end))
+
+        times = {}
+        for stage, spans in intervals.items():
+            total, covered_until = 0.0, float("-inf")
+            for start, end in sorted(spans):
+                if end > covered_until:
+                    total += end - max(start, covered_until)
+                    covered_until = end
+            times[stage] = total
+        return times
+
+    def summary(self):
+        """Stage times, counters and elapsed seconds as a JSON-serializable dict"""
+        times = self.stage_times()
+        with self._lock:
+            counters = dict(self.counters)
+            start = min((start for _, start, _ in self.spans), default=0.0)
+            end = max((end for _, _, end in self.spans), default=0.0)
+        return {
+            "elapsed": end - start,
+            "stages": {stage: times[stage] for stage in STAGES if stage in times},
+            "counters": {counter: counters.get(counter, 0) for counter in COUNTERS},
+        }
+
+
+@contextmanager
+def collect(run):
+    """Record spans of the enclosed code (and of work it submits) into run"""
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def current_run():
+    """The run spans are recorded into, or None outside collect()"""
+    return _current_run.get()
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as part of stage; a no-op outside collect()"""
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.add_span(stage, start, time.perf_counter())
+
+
+def iterate(run, generator):
+    """Yield from generator, recording spans of each step (and of work it submits) into run.
+
+    Unlike collect(), the run stays current for the generator's code only,
+    however the consumer interleaves its own work between the items.
+    """
+    context = contextvars.copy_context()
+    context.run(_current_run.set, run)
+    try:
+        while True:
+            try:
+                item = context.run(next, generator)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        context.run(generator.close)
+
+
+def count(counter, amount=1):
+    """Add amount to counter of the current run; a no-op outside collect()"""
+    run = _current_run.get()
+    if run is not None:
+        run.incr(counter, amount)
+
+
+def submit(pool, fn, *args):
+    """pool.submit that carries the current run over to the worker thread"""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _prometheus_text():
+    lines = [
+        "# HELP biasbreaker_runs_total Comparisons finished, by status.",
+        "# TYPE biasbreaker_runs_total counter",
+    ]
+    lines += [f'biasbreaker_runs_total{{status="{status}"}} {n}' for status, n in sorted(_totals["runs"].items())]
+    lines += [
+        "# HELP biasbreaker_stage_seconds_total Wall-clock seconds spent per pipeline stage.",
+        "# TYPE biasbreaker_stage_seconds_total counter",
+    ]
+    lines += [f'biasbreaker_stage_seconds_total{{stage="{stage}"}} {_totals["stages"][stage]:.6f}'
+              for stage in STAGES if stage in _totals["stages"]]
+    for counter in COUNTERS:
+        lines += [
+            f"# TYPE biasbreaker_{counter}_total counter",
+            f"biasbreaker_{counter}_total {_totals['counters'].get(counter, 0)}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def export(run, status="ok", path=None):
+    """Write a finished run to the metrics sink (METRICS_SINK unless path is given)"""
+    path = path or METRICS_SINK
+    if not path:
+        return
+    summary = run.summary()
+    with _export_lock:
+        try:
+            if path.endswith(".prom"):
+                _totals["runs"][status] = _totals["runs"].get(status, 0) + 1
+                for stage, seconds in summary["stages"].items():
+                    _totals["stages"][stage] = _totals["stages"].get(stage, 0.0) + seconds
+                for counter, value in summary["counters"].items():
+                    _totals["counters"][counter] = _totals["counters"].get(counter, 0) + value
+                # Replace atomically so a scraper never reads a half-written file
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(_prometheus_text())
+                os.replace(path + ".tmp", path)
+            else:
+                record = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "status": status, **summary}
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+        except OSError:
+            # Metrics must never break a comparison
+            pass
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from disk_cache import DiskCache
+
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE", "1") != "0"
+# Seconds before a cached page is revalidated with a conditional GET
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+PAGE_CACHE_MAX_BYTES = int(float(os.getenv("PAGE_CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+# Bump whenever extraction or cleanup changes so old entries are re-parsed
+EXTRACTION_VERSION = 3
+
+_TRACKING_PARAMS = {"fbclid", "gclid", "cmpid", "ref"}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+_cache = None
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = DiskCache("pages.sqlite", PAGE_CACHE_MAX_BYTES)
+    return _cache
+
+
+def normalize_url(url):
+    """Canonical form of a URL used as cache key"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not (k.lower().startswith("utm_") or k.lower() in _TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def _key(url):
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+def lookup(url):
+    """Return the cached entry for url, or None.
+
+    The entry is a dict with the extracted text, the validators (etag,
+    last_modified) and a 'fresh' flag telling whether it is still within TTL.
+    """
+    if not PAGE_CACHE_ENABLED:
+        return None
+    row = _get_cache().get(_key(url))
+    if row is None:
+        return None
+    value, stored_at = row
+    entry = json.loads(value)
+    if entry.get("version") != EXTRACTION_VERSION:
+        return None
+    entry["fresh"] = time.time() - stored_at < PAGE_CACHE_TTL
+    return entry
+
+
+def conditional_headers(entry):
+    """Headers turning a GET into a revalidation of a cached entry"""
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def store(url, text, response_headers):
+    """Cache the extracted text of a page together with its validators"""
+    if not PAGE_CACHE_ENABLED:
+        return
+    entry = {
+        "version": EXTRACTION_VERSION,
+        "url": normalize_url(url),
+        "text": text,
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+    }
+    _get_cache().set(_key(url), json.dumps(entry, ensure_ascii=False))
+
+
+def revalidated(url):
+    """Restart the TTL of an entry after the server answered 304 Not Modified"""
+    _get_cache().touch(_key(url))
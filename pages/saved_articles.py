@@ -1,6 +1,13 @@
 import streamlit as st
-import json
-import os
+from dotenv import load_dotenv
+
+# Settings are read from the environment when the modules below are
+# imported, so .env has to be loaded first
+load_dotenv()
+
+from article_store import extract_headline_and_content, get_store  # noqa: E402
+
+PAGE_SIZES = [10, 25, 50]
 
 # Add custom CSS for saved articles page
 st.markdown("""
@@ -42,65 +49,100 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def load_saved_articles():
-    # Get absolute path
-    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    saved_file = os.path.join(current_dir, "saved_articles.json")
-    
-    # Show file path being checked
-    st.sidebar.write(f"Looking for saved articles at: {saved_file}")
-    
-    if os.path.exists(saved_file):
-        try:
-            with open(saved_file, 'r', encoding='utf-8') as f:
-                articles = json.load(f)
-                st.sidebar.success(f"Found {len(articles)} articles")
-                return articles, current_dir
-        except json.JSONDecodeError:
-            st.sidebar.error("Error reading saved articles file")
-            return [], current_dir
-    else:
-        st.sidebar.warning("No saved articles file found")
-        return [], current_dir
-
-def read_analysis_file(filepath):
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        return f"Error reading analysis file: {str(e)}"
-
-def extract_headline_and_content(content):
-    """Extract headline and clean content from the analysis"""
-    if not content:
-        return None, None
-    
-    # Split content into lines while preserving empty lines
-    lines = content.splitlines(keepends=True)
-    headline = None
-    content_lines = []
-    content_started = False
-    
-    for line in lines:
-        # Check for headline
-        if not headline and line.lower().strip().startswith('headline:'):
-            headline = line.replace('Headline:', '').strip()
-            content_started = True
-            continue
+@st.cache_data(show_spinner=False)
+def load_listing(version, page, page_size):
+    """One page of story clusters (newest analysis of each), the cluster count and the
+    number of analyses, cached per store version"""
+    store = get_store()
+    return (store.list_clusters(limit=page_size, offset=page * page_size), store.count_clusters(),
+            store.count())
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_cluster(version, cluster):
+    """Every saved analysis of one story, cached per store version"""
+    return get_store().cluster_members(cluster)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_related(version, analysis_id):
+    """The analyses of other stories most similar to one analysis, cached per store version"""
+    return get_store().related(analysis_id)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_body(analysis_id):
+    """Article body of one saved analysis; bodies never change once saved"""
+    return get_store().get_body(analysis_id)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def search_articles(version, query):
+    """Ranked full-text matches for query, cached per store version"""
+    return get_store().search(query)
+
+def render_sources(article):
+    # Display sources at the bottom
+    if article['urls']:
+        st.markdown("---")
+        st.markdown("### Sources")
+        labels = ["CNN Article", "Fox News Article"]
+        for position, url in enumerate(article['urls']):
+            label = labels[position] if position < len(labels) else f"Source {position + 1}"
+            st.markdown(f"📰 [{label}]({url})")
+
+def render_article_body(article):
+    # Only read the article body once the reader asks for it
+    if st.toggle("Show article", key=f"show_{article['id']}"):
+        headline, clean_content = extract_headline_and_content(load_body(article['id']))
+        if headline:
+            st.markdown(f"# {headline}")
         
-        # After finding headline, collect remaining content including empty lines
-        if content_started:
-            content_lines.append(line)
-        # If no explicit headline found, use first non-empty line as headline
-        elif not headline and line.strip() and len(line.strip()) < 150:
-            headline = line.strip()
-            content_started = True
-            continue
+        if clean_content:
+            st.markdown(clean_content)
+        render_related(article)
+
+def render_related(article):
+    # Similar analyses of other stories; the article's own story is listed with it
+    related = load_related(get_store().version(), article['id'])
+    if related:
+        st.markdown("### Related analyses")
+        for other in related:
+            title = other['headline'] or f"Analysis - {other['timestamp']}"
+            st.markdown(f"- {title} ({other['timestamp']}, similarity {other['score']:.2f})")
+
+def render_cluster(article):
+    # Earlier analyses of the same story, collapsed under the newest one
+    if article['cluster_size'] < 2:
+        return
+    members = [m for m in load_cluster(get_store().version(), article['cluster']) if m['id'] != article['id']]
+    st.markdown(f"**{len(members)} earlier {'analysis' if len(members) == 1 else 'analyses'} of this story**")
+    for member in members:
+        st.caption(f"{member['timestamp']} | {member['headline'] or 'Untitled analysis'}")
+        render_article_body(member)
+
+def show_search_results(query):
+    results = search_articles(get_store().version(), query)
+    if not results:
+        st.info(f"No saved analyses match “{query}”.")
+        return
+    st.caption(f"{len(results)} best matches for “{query}”")
+    for article in results:
+        with st.expander(article['headline'] or f"Analysis - {article['timestamp']}", expanded=False):
+            if article['snippet']:
+                st.markdown(" ".join(article['snippet'].split()))
+            st.caption(article['timestamp'])
+            render_article_body(article)
+            render_sources(article)
+
+def load_saved_articles(page, page_size):
+    store = get_store()
     
-    # Join content lines preserving all original line breaks
-    cleaned_content = ''.join(content_lines)
+    # Show store path being checked
+    st.sidebar.write(f"Looking for saved articles at: {store.path}")
     
-    return headline, cleaned_content
+    articles, stories, total = load_listing(store.version(), page, page_size)
+    if total:
+        st.sidebar.success(f"Found {total} articles on {stories} stories")
+    else:
+        st.sidebar.warning("No saved articles found")
+    return articles, stories
 
 def main():
     st.title("📚 Saved Articles")
@@ -109,37 +151,43 @@ def main():
     if st.button("🔄 Refresh"):
         st.rerun()
     
-    saved_articles, current_dir = load_saved_articles()
+    query = st.text_input("Search saved analyses", placeholder="e.g. deportation judge")
+    if query.strip():
+        show_search_results(query.strip())
+        return
+    
+    page_size = st.sidebar.selectbox("Stories per page", PAGE_SIZES)
+    page = st.session_state.get("saved_page", 1)
+    saved_articles, stories = load_saved_articles(page - 1, page_size)
     
-    if not saved_articles:
+    if not stories:
         st.info("No saved analyses yet. Go to the main page to analyze and save articles.")
         return
 
-    for idx, article in enumerate(reversed(saved_articles), 1):
-        # Get the analysis content first
-        if isinstance(article['analysis'], str) and article['analysis'].startswith("Analysis saved to"):
-            filename = article['analysis'].split("Analysis saved to ")[-1].strip()
-            filepath = os.path.join(current_dir, filename)
-            analysis_content = read_analysis_file(filepath)
-        else:
-            analysis_content = article['analysis']
-        
-        # Extract headline and clean content
-        headline, clean_content = extract_headline_and_content(analysis_content)
+    page_count = max(1, -(-stories // page_size))
+    if page > page_count:
+        st.session_state.saved_page = page_count
+        st.rerun()
+    st.sidebar.number_input("Page", min_value=1, max_value=page_count, key="saved_page")
+    st.caption(f"Page {page} of {page_count}")
+
+    for idx, article in enumerate(saved_articles, (page - 1) * page_size + 1):
+        headline = article['headline']
         expander_title = headline if headline else f"Analysis {idx} - {article['timestamp']}"
+        if article['cluster_size'] > 1:
+            expander_title += f" ({article['cluster_size']} analyses)"
         
         with st.expander(expander_title, expanded=False):
-            if headline:
-                st.markdown(f"# {headline}")
-            
-            if clean_content:
-                st.markdown(clean_content)
-            
-            # Display sources at the bottom
-            st.markdown("---")
-            st.markdown("### Sources")
-            st.markdown(f"📰 [CNN Article]({article['url1']})")
-            st.markdown(f"📰 [Fox News Article]({article['url2']})")
+            details = [article['timestamp'], f"{article['word_count']} words"]
+            if article['domains']:
+                details.append(article['domains'].replace(",", " · "))
+            if article['languages']:
+                details.append(f"languages: {article['languages']}")
+            st.caption(" | ".join(details))
+
+            render_article_body(article)
+            render_sources(article)
+            render_cluster(article)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,147 @@
+import os
+import re
+
+import metrics
+from tokens import count_tokens
+
+# Token budget for the source text of the synthesis prompt (instructions come on top)
+SYNTHESIS_SOURCE_TOKENS = int(os.getenv("SYNTHESIS_SOURCE_TOKENS", "5500"))
+# Paragraphs of different sources whose shingles overlap at least this much (Jaccard) are merged
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.5"))
+SHINGLE_WORDS = 4
+
+_WORD = re.compile(r"\w+")
+
+
+def shingles(paragraph, size=SHINGLE_WORDS):
+    """Set of overlapping size-word sequences of a paragraph, ignoring case and punctuation"""
+    words = _WORD.findall(paragraph.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def find_duplicates(sources, threshold=None):
+    """Groups of near-duplicate paragraphs across sources, as lists of (source, index).
+
+    Only paragraphs sharing at least one shingle are compared. Pairs are
+    merged best match first, and a group holds at most one paragraph per
+    source.
+    """
+    threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
+    shingle_sets = {}
+    postings = {}
+    for source, paragraphs in enumerate(sources):
+        for index, paragraph in enumerate(paragraphs):
+            shingle_sets[(source, index)] = shingle_set = shingles(paragraph)
+            for shingle in shingle_set:
+                postings.setdefault(shingle, []).append((source, index))
+
+    # Shared shingle counts for every cross-source pair of paragraphs
+    overlaps = {}
+    for members in postings.values():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if a[0] != b[0]:
+                    overlaps[(a, b)] = overlaps.get((a, b), 0) + 1
+
+    candidates = []
+    for (a, b), shared in overlaps.items():
+        similarity = shared / (len(shingle_sets[a]) + len(shingle_sets[b]) - shared)
+        if similarity >= threshold:
+            candidates.append((-similarity, a, b))
+
+    group_of, groups = {}, []
+    for _, a, b in sorted(candidates):
+        if a in group_of and b in group_of:
+            continue
+        if a not in group_of and b not in group_of:
+            group_of[a] = group_of[b] = len(groups)
+            groups.append([a, b])
+            continue
+        grouped, single = (a, b) if a in group_of else (b, a)
+        group = groups[group_of[grouped]]
+        if all(member[0] != single[0] for member in group):
+            group_of[single] = group_of[grouped]
+            group.append(single)
+    return [sorted(group) for group in groups]
+
+
+def _select(items, budget):
+    """Keep the most valuable items that fit the budget, greedily by value"""
+    kept, remaining = set(), budget
+    for i in sorted(range(len(items)), key=lambda i: (-items[i]["value"], items[i]["position"])):
+        if items[i]["tokens"] <= remaining:
+            kept.add(i)
+            remaining -= items[i]["tokens"]
+    return kept
+
+
+def build_sections(articles, budget=None):
+    """Split source articles into shared and per-source paragraphs within a token budget.
+
+    Returns (shared, sources): shared lists (paragraph, source numbers) for
+    content near-duplicated across sources, keeping the longest version;
+    sources holds the remaining paragraphs of each article in order. When
+    the paragraphs exceed the budget, the least valuable are dropped: later
+    paragraphs before the lede, content of one source before shared content.
+    """
+    budget = budget or SYNTHESIS_SOURCE_TOKENS
+    sources = [[p.strip() for p in article.split("\n\n") if p.strip()] for article in articles]
+
+    items, merged = [], set()
+    for group in find_duplicates(sources):
+        merged.update(group)
+        text = max((sources[s][i] for s, i in group), key=len)
+        position = min(i for _, i in group)
+        items.append({"text": text, "sources": tuple(s + 1 for s, _ in group),
+                      "position": (position, -1), "value": len(group) / (1 + position)})
+    for source, paragraphs in enumerate(sources):
+        for index, paragraph in enumerate(paragraphs):
+            if (source, index) not in merged:
+                items.append({"text": paragraph, "sources": (source + 1,),
+                              "position": (index, source), "value": 1 / (1 + index)})
+    for item in items:
+        item["tokens"] = count_tokens(item["text"])
+
+    kept = _select(items, budget)
+    metrics.count("shared_paragraphs", len(merged))
+    metrics.count("trimmed_paragraphs", len(items) - len(kept))
+
+    ordered = [item for i, item in sorted(enumerate(items), key=lambda e: e[1]["position"]) if i in kept]
+    shared = [(item["text"], item["sources"]) for item in ordered if len(item["sources"]) > 1]
+    per_source = [[item["text"] for item in ordered if item["sources"] == (source + 1,)]
+                  for source in range(len(sources))]
+    return shared, per_source
+
+
+def _source_list(numbers):
+    names = [str(n) for n in numbers]
+    return "Sources " + (", ".join(names[:-1]) + " and " + names[-1] if len(names) > 1 else names[0])
+
+
+def render_sections(shared, sources):
+    """Source text for the synthesis prompt: a shared section, then each article's own content"""
+    parts = []
+    if shared:
+        if len(sources) > 2:
+            body = "\n\n".join(f"({_source_list(numbers)}) {text}" for text, numbers in shared)
+        else:
+            body = "\n\n".join(text for text, _ in shared)
+        reporters = "both sources" if len(sources) == 2 else "several sources"
+        parts.append(f"Shared content (reported near-identically by {reporters}):\n{body}")
+    for number, paragraphs in enumerate(sources, 1):
+        heading = f"Source {number}" + (" (content not listed above)" if shared else "")
+        parts.append(f"{heading}:\n" + ("\n\n".join(paragraphs) or "(nothing beyond the shared content)"))
+    return "\n\n\n".join(parts)
+
+
+def build_source_text(articles, budget=None):
+    """Deduplicated, budgeted source text of articles for the synthesis prompt"""
+    return render_sections(*build_sections(articles, budget))
+
+
+def trim_article(article, budget=None):
+    """One article cut down to its most valuable paragraphs within the token budget"""
+    _, (paragraphs,) = build_sections([article], budget)
+    return "\n\n".join(paragraphs)
@@ -0,0 +1,152 @@
+import os
+import threading
+
+from text_vectors import VECTOR_DIM, term_counts
+
+# Analyses at least this similar (cosine of TF-IDF vectors) cover the same
+# story and are grouped into one cluster when saved
+CLUSTER_THRESHOLD = float(os.getenv("RELATED_CLUSTER_THRESHOLD", "0.35"))
+# Related analyses returned per query, and the least similarity worth showing
+RELATED_TOP_K = int(os.getenv("RELATED_TOP_K", "5"))
+RELATED_MIN_SCORE = float(os.getenv("RELATED_MIN_SCORE", "0.15"))
+
+
+def term_vector(text):
+    """Hashed term columns and counts of text, as stored with an analysis (int32 blobs)"""
+    import numpy as np
+
+    counts = term_counts([text])
+    return counts.indices.astype(np.int32).tobytes(), counts.data.astype(np.int32).tobytes()
+
+
+class _Growable:
+    """Numpy array with amortised appends; data[:size] holds the values"""
+
+    def __init__(self, dtype, capacity=1024):
+        import numpy as np
+
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        import numpy as np
+
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            grown = np.empty(max(needed, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = values
+        self.size = needed
+
+    def view(self):
+        return self.data[:self.size]
+
+
+class RelatedIndex:
+    """Unit-length TF-IDF vectors of all saved analyses in one append-only CSR matrix.
+
+    The raw term counts live in the analysis_vectors table; refresh() only
+    loads rows added since the last call, weighting them with the document
+    frequencies at that point. Rows loaded together (e.g. the whole archive
+    at startup) therefore share one idf, and the idf of older rows drifts
+    only as much as the archive grows while the process runs. A query is a
+    single sparse matrix-vector product.
+    """
+
+    def __init__(self):
+        import numpy as np
+
+        self.ids = _Growable(np.int64)
+        self.indptr = _Growable(np.int64)
+        self.indptr.extend([0])
+        self.indices = _Growable(np.int32)
+        self.weights = _Growable(np.float32)
+        self.frequencies = np.zeros(VECTOR_DIM, dtype=np.int64)
+        self.rows = {}
+        self.last_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.ids.size
+
+    def refresh(self, conn):
+        """Append the analyses saved since the last refresh (by any process)"""
+        import numpy as np
+
+        with self._lock:
+            added = [(row["analysis_id"], np.frombuffer(row["columns"], dtype=np.int32),
+                      np.frombuffer(row["counts"], dtype=np.int32))
+                     for row in conn.execute(
+                         "SELECT analysis_id, columns, counts FROM analysis_vectors WHERE analysis_id > ? "
+                         "ORDER BY analysis_id", (self.last_id,))]
+            if not added:
+                return
+            for _, columns, _ in added:
+                self.frequencies[columns] += 1
+            idf = self._idf()
+            for analysis_id, columns, counts in added:
+                weights = (1 + np.log(counts.astype(np.float32))) * idf[columns]
+                norm = np.sqrt(weights @ weights) or 1.0
+                self.rows[analysis_id] = self.ids.size
+                self.ids.extend([analysis_id])
+                self.indices.extend(columns)
+                self.weights.extend(weights / norm)
+                self.indptr.extend([self.indices.size])
+            self.last_id = added[-1][0]
+
+    def _idf(self):
+        import numpy as np
+
+        return (np.log((1 + len(self)) / (1 + self.frequencies)) + 1).astype(np.float32)
+
+    def _scores(self, columns, weights):
+        """Cosine similarity of one unit-length vector with every row"""
+        import numpy as np
+        from scipy import sparse
+
+        query = np.zeros(VECTOR_DIM, dtype=np.float32)
+        query[columns] = weights
+        matrix = sparse.csr_matrix((self.weights.view(), self.indices.view(), self.indptr.view()),
+                                   shape=(len(self), VECTOR_DIM), copy=False)
+        return matrix @ query
+
+    def _vector(self, columns, counts):
+        import numpy as np
+
+        weights = (1 + np.log(counts.astype(np.float32))) * self._idf()[columns]
+        return weights / (np.sqrt(weights @ weights) or 1.0)
+
+    def neighbours(self, columns, counts, threshold=None):
+        """IDs of indexed analyses at least threshold similar to a stored term vector"""
+        import numpy as np
+
+        threshold = CLUSTER_THRESHOLD if threshold is None else threshold
+        columns = np.frombuffer(columns, dtype=np.int32)
+        counts = np.frombuffer(counts, dtype=np.int32)
+        with self._lock:
+            if not len(self):
+                return []
+            scores = self._scores(columns, self._vector(columns, counts))
+            return [int(i) for i in self.ids.view()[scores >= threshold]]
+
+    def related(self, analysis_id, k=None, min_score=None, exclude=()):
+        """Up to k (analysis ID, similarity) most similar to an indexed analysis, best first.
+
+        Analyses in exclude are left out before the top k are chosen.
+        """
+        import numpy as np
+
+        k = k or RELATED_TOP_K
+        min_score = RELATED_MIN_SCORE if min_score is None else min_score
+        with self._lock:
+            row = self.rows.get(analysis_id)
+            if row is None:
+                return []
+            start, end = self.indptr.data[row], self.indptr.data[row + 1]
+            scores = self._scores(self.indices.data[start:end], self.weights.data[start:end])
+            scores[row] = -1
+            scores[[self.rows[other] for other in exclude if other in self.rows]] = -1
+            top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(int(self.ids.data[i]), round(float(scores[i]), 3)) for i in top if scores[i] >= min_score]
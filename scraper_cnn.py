@@ -1,21 +1,27 @@
-import requests
-from bs4 import BeautifulSoup
 import re
-import string
 import os
-from requests.exceptions import RequestException
+import time
 from datetime import datetime
-from openai import OpenAI
-from dotenv import load_dotenv
-import langdetect
-
-# Load environment variables and initialize OpenAI client
-load_dotenv()
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
-def is_url_accessible(url, headers):
+import fetcher
+from fetcher import fetch_all, fetch_url, get_session
+import page_cache
+from text_normalize import normalize_article
+from llm import stream_chat_completion
+from prompt_builder import DUPLICATE_THRESHOLD, SYNTHESIS_SOURCE_TOKENS
+from synthesis import (MAP_REDUCE_MIN_SOURCES, SYNTHESIS_PROMPT_VERSION, SourceRenumbering,
+                       build_fact_synthesis_messages, build_synthesis_messages, canonical_order,
+                       condense_sources, source_label)
+from translation import translate_articles
+import metrics
+
+# requests, bs4, langdetect and openai are imported on first use, and the
+# OpenAI client is created lazily by llm.get_async_client, so importing this
+# module (and starting the Streamlit app) stays cheap
+
+def is_url_accessible(url, headers=None):
+    from requests.exceptions import RequestException
     try:
-        response = requests.head(url, headers=headers, timeout=10)
+        response = get_session().head(url, headers=headers, timeout=10)
         return response.status_code == 200
     except RequestException:
         return False
@@ -23,30 +29,8 @@ def is_url_accessible(url, headers):
 def translate_with_gpt(text):
     """Translate text to English using ChatGPT"""
     try:
-        # Detect language
-        lang = langdetect.detect(text)
-        
-        # Return original text if already English
-        if lang == 'en':
-            return text, lang
-            
-        # Prepare translation prompt
-        prompt = f"""Translate the following text from {lang} to English. 
-        Maintain the original meaning and tone while ensuring natural English flow.
-        Text to translate:
-        {text}"""
-        
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a professional translator skilled in maintaining context and nuance."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1500,
-            temperature=0.3
-        )
-        
-        return response.choices[0].message.content, lang
+        translated, lang = translate_articles([text])[0]
+        return translated, lang
         
     except Exception as e:
         return f"Translation error: {str(e)}", None
@@ -72,144 +56,252 @@ def extract_headline(content):
     
     return None
 
-def get_article_text_from_urls(url1, url2):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-
-    articles = []
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    for idx, url in enumerate([url1, url2], 1):
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # CNN layout
-            paragraphs = soup.find_all("div", {"data-component": "text-block"})
-            if not paragraphs:
-                article_tag = soup.find("article")
-                if article_tag:
-                    paragraphs = article_tag.find_all("p")
-
-            if not paragraphs:
-                return f"Error: Couldn't find content for Article {idx}"
-
-            article_text = "\n".join(p.get_text() for p in paragraphs)
-
-            # Clean up the text while preserving structure
-            article_text = article_text.replace('"', '"').replace('"', '"')
-            article_text = article_text.replace(''', "'").replace(''', "'")
-            article_text = article_text.replace('–', '-').replace('—', '-')
-            
-            # Split into paragraphs and clean each paragraph individually
-            paragraphs = article_text.split('\n')
-            cleaned_paragraphs = []
-            
-            for paragraph in paragraphs:
-                if paragraph.strip():  # Only process non-empty paragraphs
-                    # Clean punctuation while preserving structure
-                    spaced = re.sub(r"([{}])".format(re.escape(string.punctuation)), r" \1 ", paragraph)
-                    cleaned = re.sub(r'\s+', ' ', spaced).strip()
-                    if cleaned:  # Add only non-empty cleaned paragraphs
-                        cleaned_paragraphs.append(cleaned)
-            
-            # Join paragraphs with double line breaks for better readability
-            cleaned = '\n\n'.join(cleaned_paragraphs)
-            articles.append(cleaned)
-
-        except Exception as e:
-            return f"Error with Article {idx}: {str(e)}"
-
-    # Create 'articles' directory if it doesn't exist
-    if not os.path.exists('articles'):
-        os.makedirs('articles')
-
-    try:
-        # Translate articles if needed
-        translated_articles = []
-        source_languages = []
-        
-        for idx, article in enumerate(articles, 1):
-            translated, lang = translate_with_gpt(article)
-            if translated.startswith("Translation error"):
-                return f"Error translating Article {idx}: {translated}"
-            translated_articles.append(translated)
-            source_languages.append(lang)
-
-        # Prepare the prompt for GPT
-        prompt = f"""You are an experienced journalist writing a news article that synthesizes information from two different sources covering the same event. 
-
-        Important Context:
-        Source 1 was {f'translated from {source_languages[0]}' if source_languages[0] != 'en' else 'originally in English'}.
-        Source 2 was {f'translated from {source_languages[1]}' if source_languages[1] != 'en' else 'originally in English'}.
-        
-        Your task is to write one cohesive, well-structured news article that:
-
-        Includes all shared facts and overlapping content between the two sources in a clear, neutral, and professional journalistic tone.
-
-        Clearly highlights and attributes any differences in reporting. For example: "Source A reports 4 deaths, while Source B reports 5."
-
-        Explicitly identifies the source when citing information that is specific to one article.
-
-        Format your article exactly as follows, maintaining all line breaks:
+def extract_article_text(html, url=None):
+    """Extract and clean the article paragraphs from a page's HTML"""
+    from extractors import extract_paragraphs
 
-        Headline: [Your headline here]
+    # Site-specific extractor for url's domain, density-based fallback otherwise
+    with metrics.span("parse"):
+        paragraphs = extract_paragraphs(html, url)
 
-        [Opening paragraph summarizing the key event]
+    return clean_paragraphs(paragraphs)
 
-
-        [Subsequent paragraphs with exactly two line breaks between them]
-
-
-        Important:
-        - Start with "Headline: " followed by your headline
-        - Use exactly TWO blank lines between paragraphs (press Enter three times)
-        - Keep paragraphs concise (3-5 sentences)
-        - Use clear source attribution
-        - Highlight differences in reporting but write in a neutral tone one cohesive article
-
-        Below are the two source articles:
-        Article 1:
-        {translated_articles[0]}
-
-
-        Article 2:
-        {translated_articles[1]}
-
-        Write your article now, ensuring proper paragraph spacing."""
-
-        # Adjust the response parameters to preserve formatting
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are a professional news analyst. Maintain exact formatting with double line breaks between paragraphs. Never compress multiple line breaks."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1500,
-            temperature=0.7
-        )
-
-        # Save the unified analysis with preserved line breaks
-        unified_file = f"articles/unified_{timestamp}.txt"
-        with open(unified_file, 'w', encoding='utf-8') as f:
-            # Ensure line breaks are preserved in the saved file
-            content = response.choices[0].message.content
-            # Replace any accidentally compressed line breaks
-            content = re.sub(r'\n{2,}', '\n\n\n', content)
-            f.write(content)
-        
-        return f"Analysis saved to {unified_file}"
-
-    except Exception as e:
-        return f"Error in comparison: {str(e)}"
+def clean_paragraphs(paragraphs):
+    """Cleaned article text of extracted paragraphs, None when there are none"""
+    if not paragraphs:
+        return None
+    metrics.count("paragraphs", len(paragraphs))
+
+    # Typography, whitespace and empty paragraphs cleaned in one pass;
+    # punctuation is left intact since the text goes to the LLM
+    with metrics.span("clean"):
+        return normalize_article(paragraphs)
+
+def _read_page(url, headers):
+    """Fetch url and extract its article; returns (response, text or None).
+
+    In streaming mode the body is parsed chunk by chunk as it arrives and
+    reading stops at the end of the article or at FETCH_MAX_MB. Pages the
+    generic extractor has to parse whole are refused early when their
+    Content-Length is over the limit.
+    """
+    if not fetcher.FETCH_STREAMING:
+        with metrics.span("fetch"):
+            response = fetch_url(url, headers=headers)
+        metrics.count("bytes_downloaded", len(response.content))
+        if response.status_code == 304:
+            return response, None
+        response.encoding = 'utf-8'
+        return response, extract_article_text(response.text, url)
+
+    from extractors import can_stream, stream_paragraphs
+
+    with metrics.span("fetch"):
+        response = fetcher.open_stream(url, headers=headers, partial_ok=can_stream(url))
+    with response:
+        if response.status_code == 304:
+            return response, None
+        paragraphs = list(stream_paragraphs(fetcher.iter_text(response), url))
+    if not paragraphs and response.truncated:
+        raise fetcher.PageTooLarge(f"no article in the first {fetcher.FETCH_MAX_BYTES} bytes of {url}")
+    return response, clean_paragraphs(paragraphs)
+
+def scrape_article(url):
+    """Download a single article and return its cleaned text"""
+    cached = page_cache.lookup(url)
+    if cached and cached["fresh"]:
+        metrics.count("page_cache_hits")
+        return cached["text"]
+
+    # Revalidate stale entries with a conditional GET
+    headers = page_cache.conditional_headers(cached) if cached else None
+    response, text = _read_page(url, headers)
+    if cached and response.status_code == 304:
+        metrics.count("page_cache_hits")
+        page_cache.revalidated(url)
+        return cached["text"]
+
+    if text:
+        page_cache.store(url, text, response.headers)
+    return text
+
+class _LineBreakNormalizer:
+    """Expand runs of two or more line breaks to three, across streamed chunks"""
+
+    def __init__(self):
+        self.pending = 0
+
+    def _breaks(self):
+        count, self.pending = self.pending, 0
+        return '\n\n\n' if count >= 2 else '\n' * count
+
+    def feed(self, text):
+        out = []
+        for part in re.split(r'(\n+)', text):
+            if part.startswith('\n'):
+                self.pending += len(part)
+            elif part:
+                out.append(self._breaks() + part)
+        return ''.join(out)
+
+    def flush(self):
+        return self._breaks()
+
+def _create_unified_file(timestamp):
+    """Open a new unified file, never overwriting one from a concurrent comparison"""
+    suffix = ""
+    for attempt in range(2, 1000):
+        unified_file = f"articles/unified_{timestamp}{suffix}.txt"
+        try:
+            return unified_file, open(unified_file, 'x', encoding='utf-8')
+        except FileExistsError:
+            suffix = f"_{attempt}"
+    raise FileExistsError(f"Too many unified files for {timestamp}")
+
+class ArticleStream:
+    """The synthesized article, delivered while it is being generated.
+
+    Iterating yields text deltas as they arrive from the model and writes the
+    unified file incrementally, removing it again if synthesis fails. Once
+    exhausted, either error holds the error message or unified_file and
+    content hold the saved result, and metrics holds the timings and
+    counters of the run (also exported to METRICS_SINK).
+    stage names the pipeline step in progress, for status displays, and
+    permanent_error tells whether running the comparison again cannot help.
+    """
+
+    def __init__(self, *urls):
+        if len(urls) < 2:
+            raise ValueError("A comparison needs at least two URLs")
+        self.urls = list(urls)
+        self.error = None
+        self.permanent_error = False
+        self.unified_file = None
+        self.content = ""
+        self.source_languages = []
+        self.stage = None
+        self.metrics = metrics.RunMetrics()
+
+    def __iter__(self):
+        try:
+            yield from metrics.iterate(self.metrics, self._run())
+        except Exception as e:
+            self.error = f"Error in comparison: {str(e)}"
+        finally:
+            metrics.export(self.metrics, status="error" if self.error else "ok")
+
+    def _run(self):
+        articles = []
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        # Download and extract all sources in parallel
+        self.stage = "fetch"
+        results = fetch_all(self.urls, scrape_article)
+        for idx, (article, error) in enumerate(results, 1):
+            if error is not None:
+                self.error = f"Error with Article {idx}: {str(error)}"
+                self.permanent_error = fetcher.is_permanent(error)
+                return
+            if not article:
+                self.error = f"Error: Couldn't find content for Article {idx}"
+                self.permanent_error = True
+                return
+            articles.append(article)
+
+        # Create 'articles' directory if it doesn't exist
+        if not os.path.exists('articles'):
+            os.makedirs('articles')
+
+        # Translate articles if needed, chunks of all sources in parallel
+        try:
+            self.stage = "translate"
+            translations = translate_articles(articles)
+        except Exception as e:
+            self.error = f"Error translating articles: {str(e)}"
+            return
+        translated_articles = [text for text, _ in translations]
+        self.source_languages = [lang for _, lang in translations]
+
+        renumbering = None
+        if len(articles) < MAP_REDUCE_MIN_SOURCES:
+            # The prompt lists the sources in a fixed order, so the same sources in
+            # another order get the same prompt and cache entry; the source numbers
+            # in the article are then mapped back to the order of the URLs
+            order = canonical_order(translated_articles, self.source_languages)
+            if order != sorted(order):
+                renumbering = SourceRenumbering(order)
+            deltas = stream_chat_completion(
+                model="gpt-4",
+                messages=build_synthesis_messages([translated_articles[i] for i in order],
+                                                  [self.source_languages[i] for i in order]),
+                unordered=[f"{lang}\n{text}" for lang, text in zip(self.source_languages, translated_articles)],
+                cache_tag=f"synthesis-v{SYNTHESIS_PROMPT_VERSION}-{SYNTHESIS_SOURCE_TOKENS}-{DUPLICATE_THRESHOLD}",
+                max_tokens=1500,
+                temperature=0.7
+            )
+        else:
+            # Condense every source to facts in parallel, merge them, write from the merged facts
+            labels = [source_label(number, url, lang)
+                      for number, (url, lang) in enumerate(zip(self.urls, self.source_languages), 1)]
+            self.stage = "map"
+            fact_sheets = condense_sources(labels, translated_articles)
+            deltas = stream_chat_completion(
+                model="gpt-4",
+                messages=build_fact_synthesis_messages(fact_sheets, labels),
+                max_tokens=1500,
+                temperature=0.7
+            )
+        self.stage = "synthesize"
+        started = time.perf_counter()
+
+        # Save the unified analysis as it streams in, with preserved line breaks.
+        # The request only starts once deltas is iterated, so a failed synthesis
+        # (or a reader that stops early) removes the partial file again
+        unified_file, f = _create_unified_file(timestamp)
+        breaks = _LineBreakNormalizer()
+        with f:
+            try:
+                for delta in deltas:
+                    if renumbering:
+                        delta = renumbering.feed(delta)
+                    text = breaks.feed(delta)
+                    f.write(text)
+                    f.flush()
+                    self.content += text
+                    yield delta
+                if renumbering:
+                    delta = renumbering.flush()
+                    text = breaks.feed(delta)
+                    self.content += text
+                    f.write(text)
+                    yield delta
+                text = breaks.flush()
+                f.write(text)
+                self.content += text
+            except BaseException:
+                f.close()
+                os.remove(unified_file)
+                raise
+
+        self.metrics.add_span("synthesize", started, time.perf_counter())
+        self.unified_file = unified_file
+
+def stream_article_from_urls(*urls):
+    """Compare two or more articles, streaming the synthesized article as it is written"""
+    return ArticleStream(*urls)
+
+def get_article_text_from_urls(*urls):
+    stream = stream_article_from_urls(*urls)
+    for _ in stream:
+        pass
+    if stream.error:
+        return stream.error
+    return f"Analysis saved to {stream.unified_file}"
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
     url1 = "https://edition.cnn.com/2025/04/22/politics/abrego-garcia-judge-xinis-justice-that-ends-now/index.html"
     url2 = "https://www.foxnews.com/politics/president-trump-blasts-courts-getting-way-deportation-agenda"
     
@@ -0,0 +1,228 @@
+import asyncio
+import os
+import re
+from urllib.parse import urlsplit
+
+import metrics
+from llm import achat_completion, run_sync
+from prompt_builder import build_source_text, trim_article
+
+# Bump when a synthesis prompt changes so cached articles are regenerated
+SYNTHESIS_PROMPT_VERSION = 5
+
+# From this many sources on, each source is first condensed to a fact sheet
+# (map) and the sheets are merged in groups of REDUCE_FANIN (reduce), so no
+# prompt grows with the number of sources. A merge needs at least two sheets,
+# or the reduce would never finish
+MAP_REDUCE_MIN_SOURCES = int(os.getenv("MAP_REDUCE_MIN_SOURCES", "3"))
+REDUCE_FANIN = max(2, int(os.getenv("REDUCE_FANIN", "4")))
+FACT_SHEET_TOKENS = int(os.getenv("FACT_SHEET_TOKENS", "700"))
+
+SYSTEM_MESSAGE = ("You are a professional news analyst. Maintain exact formatting with double line breaks "
+                  "between paragraphs. Never compress multiple line breaks.")
+
+ARTICLE_FORMAT = """Format your article exactly as follows, maintaining all line breaks:
+
+        Headline: [Your headline here]
+
+        [Opening paragraph summarizing the key event]
+
+
+        [Subsequent paragraphs with exactly two line breaks between them]
+
+
+        Important:
+        - Start with "Headline: " followed by your headline
+        - Use exactly TWO blank lines between paragraphs (press Enter three times)
+        - Keep paragraphs concise (3-5 sentences)
+        - Use clear source attribution
+        - Highlight differences in reporting but write in a neutral tone one cohesive article"""
+
+
+# "Source 2", "Sources 1 and 2": how synthesized articles refer to sources. Only
+# "Source" is a label; "Article 1" may be content (e.g. of a constitution)
+_SOURCE_REFERENCE = re.compile(r"\bSources?\s+\d+(?:(?:\s*,\s*|\s+and\s+|\s*&\s*|/)\d+)*")
+_NUMBER = re.compile(r"\d+")
+
+
+def canonical_order(translated_articles, source_languages):
+    """Source indices in a fixed order that does not depend on the order the URLs came in.
+
+    The direct synthesis prompt is built in this order, so the same sources
+    always produce the same prompt (and share one cache entry).
+    """
+    return sorted(range(len(translated_articles)),
+                  key=lambda i: (source_languages[i] or "", translated_articles[i]))
+
+
+class SourceRenumbering:
+    """Rewrite "Source N" references in streamed text from prompt order to the user's order.
+
+    order lists the user's source index for every prompt position. Text is
+    held back until no reference can straddle the end of what was fed.
+    """
+
+    HOLD = 40
+
+    def __init__(self, order):
+        self.numbers = {str(position): str(index + 1) for position, index in enumerate(order, 1)}
+        self.pending = ""
+
+    def _renumber(self, text):
+        return _SOURCE_REFERENCE.sub(
+            lambda m: _NUMBER.sub(lambda n: self.numbers.get(n.group(), n.group()), m.group()), text)
+
+    def feed(self, text):
+        self.pending += text
+        cut = self.pending.rfind(" ", 0, max(len(self.pending) - self.HOLD, 0))
+        if cut <= 0:
+            return ""
+        for match in _SOURCE_REFERENCE.finditer(self.pending):
+            if match.start() < cut < match.end():
+                cut = match.start()
+                break
+        out, self.pending = self.pending[:cut], self.pending[cut:]
+        return self._renumber(out)
+
+    def flush(self):
+        out, self.pending = self.pending, ""
+        return self._renumber(out)
+
+
+def _origin(lang):
+    return f"translated from {lang}" if lang not in ('en', None) else "originally in English"
+
+
+def source_label(number, url, lang):
+    """How a source is named in prompts, e.g. "Source 2 (foxnews.com, originally in English)" """
+    host = (urlsplit(url).hostname or url).removeprefix("www.")
+    return f"Source {number} ({host}, {_origin(lang)})"
+
+
+def build_synthesis_messages(translated_articles, source_languages):
+    """Chat messages asking GPT to synthesize one article from the full source texts"""
+    count = len(translated_articles)
+    origins = "\n        ".join(f"Source {number} was {_origin(lang)}."
+                                for number, lang in enumerate(source_languages, 1))
+    prompt = f"""You are an experienced journalist writing a news article that synthesizes information from {count} different sources covering the same event.
+
+        Important Context:
+        {origins}
+
+        Your task is to write one cohesive, well-structured news article that:
+
+        Includes all shared facts and overlapping content between the sources in a clear, neutral, and professional journalistic tone.
+
+        Clearly highlights and attributes any differences in reporting. For example: "Source 1 reports 4 deaths, while Source 2 reports 5."
+
+        Explicitly identifies the source when citing information that is specific to one article.
+
+        {ARTICLE_FORMAT}
+
+        Below are the {count} source articles. Paragraphs several sources carry almost word for word are listed once under "Shared content"; each article's own content follows under its "Source N" heading, shortened to its most important paragraphs if it was too long.
+
+{build_source_text(translated_articles)}
+
+        Write your article now, ensuring proper paragraph spacing."""
+
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def build_fact_synthesis_messages(fact_sheets, labels):
+    """Chat messages asking GPT to write the article from merged fact sheets"""
+    sources = "\n        ".join(labels)
+    sheets = "\n\n\n".join(fact_sheets)
+    prompt = f"""You are an experienced journalist writing a news article that synthesizes the reporting of {len(labels)} different sources covering the same event. The sources are:
+        {sources}
+
+        Each source has been condensed into attributed facts: every fact lists the sources that report it, and conflicting accounts are marked as such.
+
+        Your task is to write one cohesive, well-structured news article that:
+
+        Includes the facts most sources agree on in a clear, neutral, and professional journalistic tone.
+
+        Clearly highlights and attributes any differences in reporting. For example: "Source 1 reports 4 deaths, while Source 3 reports 5."
+
+        Explicitly identifies the source when citing information that only some sources report.
+
+        {ARTICLE_FORMAT}
+
+        Facts:
+
+{sheets}
+
+        Write your article now, ensuring proper paragraph spacing."""
+
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt}
+    ]
+
+
+async def _extract_facts(label, text):
+    """Map: condense one source into a list of attributed facts"""
+    prompt = f"""List the facts reported in the following news article from {label}.
+
+        Write one fact per line, starting with "- " and ending with the source in brackets, e.g. "- Officials confirmed 4 deaths. [{label.split(' (')[0]}]".
+        Keep numbers, names, dates and direct quotes exactly as reported, put the most important facts first, and note how the article frames the event in a final line starting with "- Framing:".
+
+        Article:
+        {text}"""
+    with metrics.span("map"):
+        return await achat_completion(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": "You are a careful news analyst who extracts facts without adding any."},
+                {"role": "user", "content": prompt}
+            ],
+            cache_tag=f"facts-v{SYNTHESIS_PROMPT_VERSION}",
+            max_tokens=FACT_SHEET_TOKENS,
+            temperature=0
+        )
+
+
+async def _merge_facts(fact_sheets):
+    """Reduce: merge fact sheets into one, keeping every attribution"""
+    sheets = "\n\n\n".join(fact_sheets)
+    prompt = f"""Merge the following fact lists from different news sources into one list.
+
+        Write one fact per line, starting with "- ". Combine facts that say the same thing into one line listing all their sources in brackets, e.g. "[Source 1, Source 3]". When sources contradict each other, keep one line with each account and its sources and mark it "(conflicting)". Keep every source's framing line. Put the facts reported by most sources first.
+
+        Fact lists:
+
+{sheets}"""
+    with metrics.span("reduce"):
+        return await achat_completion(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": "You are a careful news analyst who merges facts without adding any."},
+                {"role": "user", "content": prompt}
+            ],
+            cache_tag=f"merge-v{SYNTHESIS_PROMPT_VERSION}",
+            max_tokens=2 * FACT_SHEET_TOKENS,
+            temperature=0
+        )
+
+
+async def _map_reduce(labels, articles):
+    sheets = await asyncio.gather(*(_extract_facts(label, trim_article(article))
+                                    for label, article in zip(labels, articles)))
+    # Merge groups until the final prompt needs at most REDUCE_FANIN sheets
+    while len(sheets) > REDUCE_FANIN:
+        groups = [sheets[i:i + REDUCE_FANIN] for i in range(0, len(sheets), REDUCE_FANIN)]
+        merged = await asyncio.gather(*(_merge_facts(group) for group in groups if len(group) > 1))
+        sheets = merged + [group[0] for group in groups if len(group) == 1]
+    return list(sheets)
+
+
+def condense_sources(labels, articles):
+    """Fact sheets of all sources, merged down to at most REDUCE_FANIN.
+
+    Sources are condensed in parallel and every merge sees at most
+    REDUCE_FANIN sheets, so prompt sizes stay bounded for any number of
+    sources and the depth grows only logarithmically.
+    """
+    return run_sync(_map_reduce(labels, articles))
@@ -0,0 +1,37 @@
+import re
+import string
+
+# Typographic quotes, dashes and non-breaking spaces mapped to ASCII. Applied
+# as chained str.replace calls: each is a C-level scan, far cheaper than a
+# per-character str.translate on non-ASCII text.
+TYPOGRAPHY = (
+    ("\u201c", '"'), ("\u201d", '"'), ("\u201e", '"'),    # curly double quotes
+    ("\u2018", "'"), ("\u2019", "'"), ("\u201a", "'"),    # curly single quotes
+    ("\u2013", "-"), ("\u2014", "-"),                      # en and em dash
+    ("\u00a0", " "),                                       # non-breaking space
+)
+
+PUNCTUATION = re.compile("([{}])".format(re.escape(string.punctuation)))
+
+
+def normalize_paragraphs(paragraphs, space_punctuation=False):
+    """Clean all paragraphs of a document in a single pass.
+
+    Maps typographic characters to ASCII, collapses whitespace and drops
+    empty paragraphs. space_punctuation surrounds every punctuation mark
+    with spaces (the old tokenizer-style cleanup); leave it off for text
+    that goes to the LLM.
+    """
+    text = "\n".join(paragraphs)
+    if not text.isascii():
+        for typographic, plain in TYPOGRAPHY:
+            text = text.replace(typographic, plain)
+    if space_punctuation:
+        text = PUNCTUATION.sub(r" \1 ", text)
+    # str.split() without arguments splits on any whitespace run and drops the ends
+    return [cleaned for cleaned in (" ".join(line.split()) for line in text.split("\n")) if cleaned]
+
+
+def normalize_article(paragraphs, space_punctuation=False):
+    """Normalized article text with paragraphs separated by blank lines"""
+    return "\n\n".join(normalize_paragraphs(paragraphs, space_punctuation))
@@ -0,0 +1,114 @@
+import os
+import re
+import zlib
+from functools import lru_cache
+
+# numpy and scipy are imported on first use, like the other heavy
+# dependencies, so modules importing this one stay cheap to load
+
+# Terms are hashed into this many columns, so vectors built in different runs
+# share one space without storing a vocabulary
+VECTOR_DIM = 2 ** int(os.getenv("VECTOR_DIM_BITS", "18"))
+# Rows multiplied at once when searching for similar pairs; bounds the size
+# of each block of the similarity matrix
+SIMILARITY_BATCH = int(os.getenv("SIMILARITY_BATCH", "512"))
+
+# Words of three or more letters
+_TERM = re.compile(r"[^\W\d_]{3,}")
+
+STOP_WORDS = frozenset("""
+about above after again against all also and any are because been before being below between both but
+can could did does doing down during each few for from further had has have having her here hers
+herself him himself his how into its itself just more most not now off once only other our ours
+ourselves out over own said same says she should some such than that the their theirs them themselves
+then there these they this those through too under until very was were what when where which while
+who whom why will with would you your yours yourself yourselves told according
+""".split())
+
+
+def terms(text):
+    """Lower-cased words of text, without stop words"""
+    return [term for term in _TERM.findall(text.lower()) if term not in STOP_WORDS]
+
+
+@lru_cache(maxsize=1 << 16)
+def term_column(term):
+    """Column of a term: a stable hash, the same in every process"""
+    return zlib.crc32(term.encode("utf-8")) % VECTOR_DIM
+
+
+def term_counts(texts):
+    """Sparse matrix of term counts with one row per text"""
+    import numpy as np
+    from scipy import sparse
+
+    indptr, indices = [0], []
+    for text in texts:
+        indices.extend(term_column(term) for term in terms(text))
+        indptr.append(len(indices))
+    counts = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                               shape=(len(indptr) - 1, VECTOR_DIM))
+    counts.sum_duplicates()
+    return counts
+
+
+def document_frequencies(counts):
+    """Number of rows of a term-count matrix each column occurs in"""
+    import numpy as np
+
+    return np.bincount(counts.indices, minlength=VECTOR_DIM)
+
+
+def inverse_document_frequencies(frequencies, documents):
+    """Smoothed idf weights for document frequencies counted over documents texts"""
+    import numpy as np
+
+    return (np.log((1 + documents) / (1 + frequencies)) + 1).astype(np.float32)
+
+
+def normalize_rows(matrix):
+    """matrix with every non-zero row scaled to unit length"""
+    import numpy as np
+    from scipy import sparse
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+def weigh(counts, idf):
+    """Unit-length TF-IDF rows of a term-count matrix, with sublinear term frequency"""
+    import numpy as np
+
+    weighted = counts.copy()
+    weighted.data = (1 + np.log(weighted.data)) * idf[weighted.indices]
+    return normalize_rows(weighted)
+
+
+def tfidf(texts):
+    """Unit-length TF-IDF vectors of texts, with idf taken over texts themselves"""
+    counts = term_counts(texts)
+    return weigh(counts, inverse_document_frequencies(document_frequencies(counts), counts.shape[0]))
+
+
+def similar_pairs(left, right, threshold, batch_size=None):
+    """Index pairs of rows of left and right whose cosine similarity is at least threshold.
+
+    Rows must have unit length. Returns arrays (left rows, right rows,
+    similarities). left is multiplied in blocks of batch_size rows, so only
+    one block of the similarity matrix exists at a time.
+    """
+    import numpy as np
+
+    batch_size = batch_size or SIMILARITY_BATCH
+    right_t = right.T.tocsr()
+    rows, cols, similarities = [], [], []
+    for start in range(0, left.shape[0], batch_size):
+        block = (left[start:start + batch_size] @ right_t).tocoo()
+        keep = block.data >= threshold
+        rows.append(block.row[keep] + start)
+        cols.append(block.col[keep])
+        similarities.append(block.data[keep])
+    if not rows:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0, dtype=np.float32)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(similarities)
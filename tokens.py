@@ -0,0 +1,23 @@
+_encodings = {}
+
+
+def _get_encoding(model):
+    """tiktoken encoding for model, loaded on first use; False when it cannot be loaded"""
+    if model not in _encodings:
+        try:
+            import tiktoken
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except Exception:  # not installed, or its encoding file cannot be downloaded
+            _encodings[model] = False
+    return _encodings[model]
+
+
+def count_tokens(text, model="gpt-4"):
+    """Number of tokens text takes in a prompt (estimated without tiktoken)"""
+    encoding = _get_encoding(model)
+    if not encoding:
+        # Roughly four characters per token for ASCII prose; CJK, Cyrillic,
+        # Arabic etc. take up to a token per character, so count each as one
+        non_ascii = sum(1 for char in text if ord(char) > 127)
+        return (len(text) - non_ascii) // 4 + non_ascii + 1
+    return len(encoding.encode(text))
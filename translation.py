@@ -0,0 +1,155 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from language import detect_language
+from llm import CompletionTruncated, chat_completion
+import metrics
+from tokens import count_tokens
+
+# Input token budget per translation request and concurrent requests allowed
+TRANSLATION_CHUNK_TOKENS = int(os.getenv("TRANSLATION_CHUNK_TOKENS", "900"))
+TRANSLATION_WORKERS = int(os.getenv("TRANSLATION_WORKERS", "4"))
+# Output allowance per translation request; a chunk whose translation runs
+# past it is split in half and translated again
+TRANSLATION_MAX_TOKENS = 1500
+
+# Latin sentence ends need following whitespace (so "3.5" and "U.S." stay
+# whole); CJK, Arabic and Devanagari ones split even without it
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[\u3002\uff01\uff1f\uff0e\uff61\u061f\u06d4\u0964\u2026])\s*")
+
+_pool = ThreadPoolExecutor(max_workers=TRANSLATION_WORKERS, thread_name_prefix="translate")
+
+
+def _split_characters(text, max_tokens):
+    """Halve text without regard to words until every piece fits, for scripts without spaces"""
+    if count_tokens(text) <= max_tokens or len(text) < 2:
+        return [text]
+    middle = len(text) // 2
+    return _split_characters(text[:middle], max_tokens) + _split_characters(text[middle:], max_tokens)
+
+
+def _split_oversized(paragraph, max_tokens):
+    """Break a paragraph that alone exceeds the budget on sentence, word, then character boundaries"""
+    pieces = []
+    for sentence in _SENTENCE_END.split(paragraph):
+        if not sentence:
+            continue
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        current = []
+        for word in sentence.split():
+            oversized = count_tokens(word) > max_tokens
+            if current and (oversized or count_tokens(" ".join(current + [word])) > max_tokens):
+                pieces.append(" ".join(current))
+                current = []
+            if oversized:
+                pieces.extend(_split_characters(word, max_tokens))
+            else:
+                current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+    return pieces
+
+
+def _join_units(units):
+    """Rejoin (paragraph index, text) units, keeping pieces of one paragraph together"""
+    text, previous = "", None
+    for index, piece in units:
+        if previous is None:
+            text = piece
+        else:
+            text += (" " if index == previous else "\n\n") + piece
+        previous = index
+    return text
+
+
+def chunk_paragraphs(text, max_tokens=None):
+    """Split an article on paragraph boundaries into chunks of at most max_tokens"""
+    max_tokens = max_tokens or TRANSLATION_CHUNK_TOKENS
+    paragraphs = [p for p in text.split("\n\n") if p.strip()]
+
+    units = []
+    for index, paragraph in enumerate(paragraphs):
+        if count_tokens(paragraph) > max_tokens:
+            units.extend((index, piece) for piece in _split_oversized(paragraph, max_tokens))
+        else:
+            units.append((index, paragraph))
+
+    chunks, current, current_tokens = [], [], 0
+    for index, piece in units:
+        piece_tokens = count_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append(_join_units(current))
+            current, current_tokens = [], 0
+        current.append((index, piece))
+        current_tokens += piece_tokens
+    if current:
+        chunks.append(_join_units(current))
+    return chunks
+
+
+def translate_chunk(text, lang):
+    """Translate one chunk of text from lang to English.
+
+    A translation that would be cut off at the output limit is redone in two
+    halves, split between paragraphs or else within the paragraph.
+    """
+    try:
+        return _translate(text, lang)
+    except CompletionTruncated:
+        paragraphs = text.split("\n\n")
+        if len(paragraphs) > 1:
+            middle = len(paragraphs) // 2
+            halves, separator = ["\n\n".join(paragraphs[:middle]), "\n\n".join(paragraphs[middle:])], "\n\n"
+        else:
+            halves, separator = _split_oversized(text, max(count_tokens(text) // 2, 1)), " "
+        if len(halves) < 2:
+            raise
+        return separator.join(translate_chunk(half, lang) for half in halves)
+
+
+def _translate(text, lang):
+    prompt = f"""Translate the following text from {lang} to English. 
+        Maintain the original meaning and tone while ensuring natural English flow.
+        Text to translate:
+        {text}"""
+
+    with metrics.span("translate"):
+        return chat_completion(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": "You are a professional translator skilled in maintaining context and nuance."},
+                {"role": "user", "content": prompt}
+            ],
+            complete=True,
+            max_tokens=TRANSLATION_MAX_TOKENS,
+            temperature=0.3
+        )
+
+
+def translate_articles(articles):
+    """Translate every non-English article to English.
+
+    All chunks of all articles are translated concurrently on a bounded
+    worker pool and put back together in their original order. Returns a
+    list of (text, lang) tuples; raises if any chunk fails.
+    """
+    with metrics.span("detect"):
+        languages = [detect_language(article) for article in articles]
+
+    jobs = []
+    for article, lang in zip(articles, languages):
+        if lang in ("en", None):
+            jobs.append(None)
+        else:
+            jobs.append([metrics.submit(_pool, translate_chunk, chunk, lang) for chunk in chunk_paragraphs(article)])
+
+    results = []
+    for article, lang, futures in zip(articles, languages, jobs):
+        if futures is None:
+            results.append((article, lang))
+        else:
+            results.append(("\n\n".join(future.result() for future in futures), lang))
+    return results